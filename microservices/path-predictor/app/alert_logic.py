@@ -1,46 +1,56 @@
-import pika
-import json
-import os
+import numpy as np
+from app.alert_publisher import alert_publisher
 
-RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'rabbitmq')
-RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'edupath')
-RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'edupath')
+SUCCESS_THRESHOLD = 0.60
+FRAGILE_THRESHOLD = 0.40
+
+ALERT_MESSAGES = {
+    "INFO": "✅ Fortes chances de réussite",
+    "WARNING": "⚠️ Étudiant fragile",
+    "CRITICAL": "🚨 Risque élevé d’échec",
+}
 
 def send_to_rabbitmq(message: dict):
-    try:
-        credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
-        connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST, credentials=credentials))
-        channel = connection.channel()
-        channel.queue_declare(queue='student_alerts')
-        
-        channel.basic_publish(
-            exchange='',
-            routing_key='student_alerts',
-            body=json.dumps(message)
-        )
-        connection.close()
-    except Exception as e:
-        print(f"Failed to send to RabbitMQ: {e}")
+    alert_publisher.publish(message)
+
+def send_batch_to_rabbitmq(messages: list):
+    """Confie les messages à l'éditeur d'alertes, sans attendre le broker."""
+    alert_publisher.publish_batch(messages)
+
+def _alert_message(student_id, severity: str) -> dict:
+    return {
+        "student_id": student_id,
+        "message": ALERT_MESSAGES[severity],
+        "severity": severity,
+        "type": "performance_alert"
+    }
+
+def classify_severities(probabilities) -> np.ndarray:
+    """Sévérité de chaque probabilité de réussite, calculée sur tout le tableau."""
+    probabilities = np.asarray(probabilities, dtype=float)
+    return np.select(
+        [probabilities >= SUCCESS_THRESHOLD, probabilities >= FRAGILE_THRESHOLD],
+        ["INFO", "WARNING"],
+        default="CRITICAL"
+    )
 
 def generate_alert(probability_success: float, student_id: int = None) -> str:
-    alert_msg = ""
-    severity = "INFO"
-    
-    if probability_success >= 0.60:
-        alert_msg = "✅ Fortes chances de réussite"
-    elif probability_success >= 0.40:
-        alert_msg = "⚠️ Étudiant fragile"
-        severity = "WARNING"
-    else:
-        alert_msg = "🚨 Risque élevé d’échec"
-        severity = "CRITICAL"
+    severity = str(classify_severities([probability_success])[0])
 
     if student_id and severity != "INFO":
-        send_to_rabbitmq({
-            "student_id": student_id,
-            "message": alert_msg,
-            "severity": severity,
-            "type": "performance_alert"
-        })
-
-    return alert_msg
+        send_to_rabbitmq(_alert_message(student_id, severity))
+
+    return ALERT_MESSAGES[severity]
+
+def generate_alerts(probabilities, student_ids: list) -> list:
+    """
+    Version lot de generate_alert : un seul calcul des seuils pour tout le
+    lot et une seule publication RabbitMQ pour toutes les alertes.
+    """
+    severities = classify_severities(probabilities)
+    send_batch_to_rabbitmq([
+        _alert_message(student_id, str(severity))
+        for student_id, severity in zip(student_ids, severities)
+        if student_id and severity != "INFO"
+    ])
+    return [ALERT_MESSAGES[str(severity)] for severity in severities]
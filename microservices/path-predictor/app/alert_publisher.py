@@ -0,0 +1,130 @@
+import aio_pika
+import asyncio
+import json
+import os
+import threading
+from aio_pika.pool import Pool
+
+RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'rabbitmq')
+RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'edupath')
+RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'edupath')
+RABBITMQ_URL = os.getenv('RABBITMQ_URL', f'amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:5672')
+ALERTS_QUEUE = 'student_alerts'
+# Alerts handed over but not confirmed by the broker yet; beyond this, new alerts are dropped
+ALERT_MAX_PENDING = int(os.getenv('ALERT_MAX_PENDING', '10000'))
+# Confirm-mode channels kept open, i.e. alert batches sent at the same time
+ALERT_PUBLISHER_CHANNELS = int(os.getenv('ALERT_PUBLISHER_CHANNELS', '4'))
+# How long shutdown waits for unconfirmed alerts
+ALERT_SHUTDOWN_TIMEOUT = float(os.getenv('ALERT_SHUTDOWN_TIMEOUT', '5'))
+RETRY_DELAY = 5
+
+class AlertPublisher:
+    """
+    Sends the student_alerts messages on the API's event loop, over one
+    robust connection and a pool of confirm-mode channels.
+
+    publish_batch() may be called from the threads that score predictions:
+    it only schedules the send and returns.
+    """
+
+    def __init__(self, url=RABBITMQ_URL, queue_name=ALERTS_QUEUE, max_pending=ALERT_MAX_PENDING,
+                 channels=ALERT_PUBLISHER_CHANNELS):
+        self.url = url
+        self.queue_name = queue_name
+        self.max_pending = max_pending
+        self.channels = channels
+        self._loop = None
+        self._connection = None
+        self._pool = None
+        self._connect_lock = None
+        self._tasks = set()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    async def start(self):
+        """Binds the publisher to the running loop; the broker is connected on the first alert."""
+        self._loop = asyncio.get_running_loop()
+        self._connect_lock = asyncio.Lock()
+
+    async def stop(self, timeout: float = ALERT_SHUTDOWN_TIMEOUT):
+        """Waits up to `timeout` for unconfirmed alerts, then closes the connection."""
+        if self._tasks:
+            _, unconfirmed = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if unconfirmed:
+                print(f"Failed to send to RabbitMQ: shutting down with {self._pending} unconfirmed alert(s), dropping them")
+                for task in unconfirmed:
+                    task.cancel()
+                await asyncio.gather(*unconfirmed, return_exceptions=True)
+        if self._pool is not None:
+            await self._pool.close()
+        if self._connection is not None:
+            await self._connection.close()
+        self._loop = self._pool = self._connection = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def publish(self, message: dict) -> bool:
+        return self.publish_batch([message])
+
+    def publish_batch(self, messages) -> bool:
+        """Schedules the alerts without waiting for the broker. Returns False if they were dropped."""
+        messages = list(messages)
+        if not messages:
+            return True
+        if self._loop is None:
+            print(f"Failed to send to RabbitMQ: alert publisher not started, dropping {len(messages)} alert(s)")
+            return False
+        with self._pending_lock:
+            if self._pending + len(messages) > self.max_pending:
+                print(f"Failed to send to RabbitMQ: {self._pending} alert(s) unconfirmed, dropping {len(messages)} alert(s)")
+                return False
+            self._pending += len(messages)
+        self._loop.call_soon_threadsafe(self._schedule, messages)
+        return True
+
+    def _schedule(self, messages):
+        task = asyncio.create_task(self._send(messages))
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._finished(done, len(messages)))
+
+    def _finished(self, task, count):
+        self._tasks.discard(task)
+        with self._pending_lock:
+            self._pending -= count
+
+    async def _channels(self) -> Pool:
+        async with self._connect_lock:
+            if self._pool is None:
+                if self._connection is None:
+                    self._connection = await aio_pika.connect_robust(self.url)
+                channel = await self._connection.channel()
+                # Same arguments as the consumers (teacher console, student coach)
+                await channel.declare_queue(self.queue_name, durable=True)
+                await channel.close()
+                self._pool = Pool(self._open_channel, max_size=self.channels)
+                print(f"[RabbitMQ] Connected to {self.url} and queue {self.queue_name} asserted.")
+            return self._pool
+
+    async def _open_channel(self):
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _send(self, messages):
+        """Publishes one batch on a pooled channel, retrying until every message is confirmed."""
+        while True:
+            try:
+                async with (await self._channels()).acquire() as channel:
+                    await asyncio.gather(*(
+                        channel.default_exchange.publish(
+                            aio_pika.Message(body=json.dumps(message).encode(), delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+                            routing_key=self.queue_name
+                        )
+                        for message in messages
+                    ))
+                return
+            except Exception as e:
+                print(f"Failed to send to RabbitMQ: {e}. Retrying in {RETRY_DELAY} seconds...")
+                await asyncio.sleep(RETRY_DELAY)
+
+alert_publisher = AlertPublisher()
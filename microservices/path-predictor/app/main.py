@@ -1,9 +1,25 @@
-from fastapi import FastAPI
-from app.model import predict_probability
-from app.alert_logic import generate_alert
+import os
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.model import predict_probability, predict_probabilities, resolve_features
+from app.alert_logic import generate_alert, generate_alerts
+from app.alert_publisher import alert_publisher
+from app.upstream import upstream_client
+
+PREDICT_BATCH_LIMIT = int(os.getenv("PREDICT_BATCH_LIMIT", "1000"))
 
 app = FastAPI(title="PathPredictor AI Service")
 
+@app.on_event("startup")
+async def startup_event():
+    await alert_publisher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await upstream_client.aclose()
+    # Wait for the alerts not confirmed yet
+    await alert_publisher.stop()
+
 @app.get("/")
 def read_root():
     return {"service": "PathPredictor AI Service", "status": "running"}
@@ -12,12 +28,21 @@ def read_root():
 def health_check():
     return {"status": "ok"}
 
+def _score(student_data: dict):
+    prob_success = predict_probability(student_data)
+    return prob_success, generate_alert(prob_success, student_id=student_data.get("student_id"))
+
+def _score_batch(students: list, student_ids: list):
+    prob_success = predict_probabilities(students)
+    return prob_success, generate_alerts(prob_success, student_ids)
+
 @app.post("/predict")
-def predict(student_data: dict):
+async def predict(student_data: dict):
     student_id = student_data.get("student_id")
-    prob_success = predict_probability(student_data)
+    student_data = (await resolve_features([student_data]))[0]
+    # The model call blocks: keep it off the event loop
+    prob_success, alert = await run_in_threadpool(_score, student_data)
     prob_failure = 1 - prob_success
-    alert = generate_alert(prob_success, student_id=student_id)
 
     return {
         "student_id": student_id,
@@ -25,3 +50,32 @@ def predict(student_data: dict):
         "probability_failure": round(prob_failure, 2),
         "alert": alert
     }
+
+@app.post("/predict/batch")
+async def predict_batch(payload: dict):
+    """
+    Same as /predict for {"students": [...]}: one upstream request per
+    service, one feature matrix, one model call and one RabbitMQ
+    publication for the whole batch.
+    """
+    students = payload.get("students")
+    if not isinstance(students, list) or not all(isinstance(s, dict) for s in students):
+        raise HTTPException(status_code=422, detail="'students' must be a list of objects")
+    if len(students) > PREDICT_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_LIMIT} students per batch")
+
+    student_ids = [s.get("student_id") for s in students]
+    students = await resolve_features(students)
+    prob_success, alerts = await run_in_threadpool(_score_batch, students, student_ids)
+
+    return {
+        "predictions": [
+            {
+                "student_id": student_id,
+                "probability_success": round(success, 2),
+                "probability_failure": round(1 - success, 2),
+                "alert": alert
+            }
+            for student_id, success, alert in zip(student_ids, prob_success.tolist(), alerts)
+        ]
+    }
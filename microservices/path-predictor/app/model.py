@@ -1,11 +1,7 @@
-import requests
 import numpy as np
 import joblib
 import os
-
-# URLs internes Docker (DNS par nom de service)
-STUDENT_PROFILER_URL = "http://student-profiler:8000/profile"
-PREPADATA_URL = "http://prepadata:8001/features"
+from app.upstream import upstream_client
 
 # Ordre EXACT utilisé à l'entraînement
 FEATURES = [
@@ -37,78 +33,54 @@ for path in MODEL_PATHS:
 if model is None:
     print("Warning: No model file found. Predictions will be mocked.")
 
-def fetch_features_from_services(student_id: int) -> dict:
+async def fetch_features_from_services(student_id: int) -> dict:
     """
-    Récupère les features depuis les microservices amont
+    Récupère les features depuis les microservices amont (en parallèle)
     """
-    # Mock implementation for now if services are not reachable
-    # In production, this should handle connection errors gracefully
-    try:
-        # 1️⃣ StudentProfiler
-        profiler_response = requests.get(
-            f"{STUDENT_PROFILER_URL}/{student_id}",
-            timeout=5
-        )
-        if profiler_response.status_code == 200:
-            profiler = profiler_response.json()
-        else:
-            # Fallback mock data
-            profiler = {"mean_score": 75.0, "progress_rate": 0.5, "cluster_id": 1}
-
-        # 2️⃣ PrepaData
-        # prepadata_response = requests.get(
-        #     PREPADATA_URL,
-        #     params={"student_id": student_id},
-        #     timeout=5
-        # )
-        # prepadata_response.raise_for_status()
-        # prepadata = prepadata_response.json()
-
-        # Mock prepadata for now as endpoint might differ
-        prepadata = {"total_clicks": 100, "active_days": 10}
-
-        # 3️⃣ Fusion des features
-        return {
-            "mean_score": profiler.get("mean_score", 0),
-            "progress_rate": profiler.get("progress_rate", 0),
-            "cluster_id": profiler.get("cluster_id", 0),
-            "total_clicks": prepadata.get("total_clicks", 0),
-            "active_days": prepadata.get("active_days", 0)
-        }
-    except Exception as e:
-        print(f"Error fetching features: {e}")
-        # Return default values to avoid crashing
-        return {
-            "mean_score": 50.0,
-            "progress_rate": 0.0,
-            "cluster_id": 0,
-            "total_clicks": 0,
-            "active_days": 0
-        }
+    return await upstream_client.fetch_features(student_id)
 
 
-def build_model_input(student_data: dict) -> np.ndarray:
-    """
-    Construit l'input numpy attendu par XGBoost
-    """
+def _needs_fetch(student_data: dict) -> bool:
     # If student_data contains the features directly, use them
     # Otherwise fetch them using student_id
+    return "mean_score" not in student_data and bool(student_data.get("student_id"))
+
 
-    if "mean_score" in student_data:
-        features = student_data
+async def resolve_features(students: list) -> list:
+    """
+    Complète les étudiants sans features avec celles des services amont :
+    un seul étudiant est récupéré directement, plusieurs en un lot.
+    """
+    missing = [s for s in students if _needs_fetch(s)]
+    if not missing:
+        return students
+    if len(missing) == 1:
+        fetched = {str(missing[0]["student_id"]): await fetch_features_from_services(missing[0]["student_id"])}
     else:
-        student_id = student_data.get("student_id")
-        if student_id:
-            features = fetch_features_from_services(student_id)
-        else:
-             features = {f: 0 for f in FEATURES}
+        fetched = await upstream_client.fetch_features_batch([s["student_id"] for s in missing])
+    return [
+        {**s, **fetched[str(s["student_id"])]} if _needs_fetch(s) else s
+        for s in students
+    ]
 
-    # Ensure all features exist
-    row = []
-    for f in FEATURES:
-        row.append(features.get(f, 0))
 
-    return np.array([row])
+def _feature_row(student_data: dict) -> list:
+    # Ensure all features exist (features are resolved beforehand)
+    return [student_data.get(f, 0) for f in FEATURES]
+
+
+def build_model_input(student_data: dict) -> np.ndarray:
+    """
+    Construit l'input numpy attendu par XGBoost
+    """
+    return np.array([_feature_row(student_data)])
+
+
+def build_model_matrix(students: list) -> np.ndarray:
+    """
+    Construit la matrice N×len(FEATURES) pour un lot d'étudiants
+    """
+    return np.array([_feature_row(s) for s in students], dtype=float).reshape(len(students), len(FEATURES))
 
 
 def predict_probability(student_data: dict) -> float:
@@ -124,3 +96,20 @@ def predict_probability(student_data: dict) -> float:
     except Exception as e:
         print(f"Prediction error: {e}")
         return 0.0
+
+
+def predict_probabilities(students: list) -> np.ndarray:
+    """
+    Prédit la probabilité de réussite d'un lot d'étudiants en un seul appel au modèle
+    """
+    if model is None:
+        return np.full(len(students), 0.5) # Default if model not loaded
+    if not students:
+        return np.zeros(0)
+
+    X = build_model_matrix(students)
+    try:
+        return model.predict_proba(X)[:, 1].astype(float)
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return np.zeros(len(students))
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import httpx
+
+# URLs internes Docker (DNS par nom de service)
+STUDENT_PROFILER_BASE_URL = os.getenv("STUDENT_PROFILER_BASE_URL", "http://student-profiler:8000")
+PREPADATA_BASE_URL = os.getenv("PREPADATA_BASE_URL", "http://prepadata:8001")
+STUDENT_PROFILER_URL = f"{STUDENT_PROFILER_BASE_URL}/profile"
+PREPADATA_URL = f"{PREPADATA_BASE_URL}/features"
+
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+# Ids par requête de lot (student-profiler en accepte 1000 par défaut)
+UPSTREAM_BATCH_SIZE = int(os.getenv("UPSTREAM_BATCH_SIZE", "500"))
+
+# Réponses de repli, identiques aux anciennes données simulées
+PROFILER_FALLBACK = {"mean_score": 75.0, "progress_rate": 0.5, "cluster_id": 1}
+PREPADATA_FALLBACK = {"total_clicks": 100, "active_days": 10}
+DEFAULT_PROFILER = {"mean_score": 50.0, "progress_rate": 0.0, "cluster_id": 0}
+
+
+def merge_features(profiler: dict, prepadata: dict) -> dict:
+    """Fusion des features des deux services, dans les noms attendus par le modèle."""
+    return {
+        "mean_score": profiler.get("mean_score", 0),
+        "progress_rate": profiler.get("progress_rate", 0),
+        "cluster_id": profiler.get("cluster_id", 0),
+        "total_clicks": prepadata.get("total_clicks", 0),
+        "active_days": prepadata.get("active_days", 0)
+    }
+
+
+class UpstreamClient:
+    """
+    Client HTTP asynchrone partagé vers student-profiler et PrepaData.
+
+    Les connexions sont gardées ouvertes (keep-alive) et limitées en nombre,
+    et les deux services sont interrogés en parallèle : la latence d'une
+    prédiction est celle du service le plus lent, pas leur somme. Un lot
+    d'étudiants coûte une requête par service (par UPSTREAM_BATCH_SIZE ids).
+    """
+
+    def __init__(self, timeout: float = UPSTREAM_TIMEOUT, max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+                 max_keepalive: int = UPSTREAM_MAX_KEEPALIVE, batch_size: int = UPSTREAM_BATCH_SIZE):
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.batch_size = batch_size
+        self._client = None
+        self._loop = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Un client est lié à la boucle d'événements qui l'a créé
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def fetch_features(self, student_id) -> dict:
+        profiler, prepadata = await asyncio.gather(self._profiler(student_id), self._prepadata(student_id))
+        return merge_features(profiler, prepadata)
+
+    async def fetch_features_batch(self, student_ids: list) -> dict:
+        """Features de chaque étudiant, indexées par str(student_id)."""
+        keys = list(dict.fromkeys(str(student_id) for student_id in student_ids))
+        chunks = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+        results = await asyncio.gather(
+            *(self._profiler_batch(chunk) for chunk in chunks),
+            *(self._prepadata_batch(chunk) for chunk in chunks)
+        )
+        profilers, prepadatas = {}, {}
+        for result in results[:len(chunks)]:
+            profilers.update(result)
+        for result in results[len(chunks):]:
+            prepadatas.update(result)
+        return {key: merge_features(profilers[key], prepadatas[key]) for key in keys}
+
+    async def _profiler(self, student_id) -> dict:
+        try:
+            response = await self._http().get(f"{STUDENT_PROFILER_URL}/{student_id}")
+            if response.status_code == 200:
+                return response.json()
+            return PROFILER_FALLBACK
+        except Exception as e:
+            print(f"Error fetching profiler features: {e}")
+            return DEFAULT_PROFILER
+
+    async def _prepadata(self, student_id) -> dict:
+        try:
+            response = await self._http().get(PREPADATA_URL, params={"student_id": student_id})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching PrepaData features: {e}")
+            return PREPADATA_FALLBACK
+
+    async def _profiler_batch(self, keys: list) -> dict:
+        try:
+            response = await self._http().post(f"{STUDENT_PROFILER_BASE_URL}/profiles:batchGet", json={"student_ids": keys})
+            if response.status_code != 200:
+                return {key: PROFILER_FALLBACK for key in keys}
+            found = {str(p["student_id"]): p for p in response.json()["profiles"]}
+            return {key: found.get(key, PROFILER_FALLBACK) for key in keys}
+        except Exception as e:
+            print(f"Error fetching profiler features: {e}")
+            return {key: DEFAULT_PROFILER for key in keys}
+
+    async def _prepadata_batch(self, keys: list) -> dict:
+        try:
+            response = await self._http().post(f"{PREPADATA_URL}:batchGet", json={"student_ids": keys})
+            response.raise_for_status()
+            found = {str(f["student_id"]): f for f in response.json()["features"]}
+            return {key: found.get(key, PREPADATA_FALLBACK) for key in keys}
+        except Exception as e:
+            print(f"Error fetching PrepaData features: {e}")
+            return {key: PREPADATA_FALLBACK for key in keys}
+
+
+upstream_client = UpstreamClient()
@@ -1,4 +1,6 @@
 from fastapi import FastAPI, BackgroundTasks
+from pydantic import BaseModel
+from typing import List
 import subprocess
 import os
 import logging
@@ -30,6 +32,17 @@ def get_features(student_id: int):
         "last_active": "2023-10-27"
     }
 
+class FeaturesBatchRequest(BaseModel):
+    student_ids: List[int]
+
+@app.post("/features:batchGet")
+def get_features_batch(request: FeaturesBatchRequest):
+    """
+    Features of many students in one request, in request order.
+    Mock data, like /features.
+    """
+    return {"features": [get_features(student_id) for student_id in request.student_ids]}
+
 @app.post("/run-etl")
 async def run_etl(background_tasks: BackgroundTasks):
     """
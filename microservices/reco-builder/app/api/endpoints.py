@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db, pool_stats
 from app.schemas.recommendation import RecommendationRequest, RecommendationResponse, ResourceCreate, ResourceRead
 from app.services.recommender import recommender_service
 from app.services.embeddings import embedding_service
@@ -12,7 +12,7 @@ from app.models.vector_index import vector_index
 router = APIRouter()
 
 @router.post("/recommend", response_model=RecommendationResponse)
-def recommend(request: RecommendationRequest, db: Session = Depends(get_db)):
+def recommend(request: RecommendationRequest, db: Session = Depends(get_read_db)):
     if vector_index.ntotal == 0:
         raise HTTPException(status_code=404, detail="Index is empty. No resources available.")
     
@@ -22,7 +22,9 @@ def recommend(request: RecommendationRequest, db: Session = Depends(get_db)):
         request.top_k, 
         request.student_id, 
         request.student_profile, 
-        request.risk_level
+        request.risk_level,
+        diversify=request.diversify,
+        diversity_lambda=request.diversity_lambda
     )
     
     return {
@@ -31,7 +33,8 @@ def recommend(request: RecommendationRequest, db: Session = Depends(get_db)):
         "metadata": {
             "profile_used": request.student_profile,
             "risk_used": request.risk_level,
-            "augmented_query": augmented_query
+            "augmented_query": augmented_query,
+            "diversified": bool(request.diversify)
         }
     }
 
@@ -64,8 +67,8 @@ async def add_resource(
     db.commit()
     db.refresh(new_res)
     
-    # 3. Rebuild index
-    embedding_service.rebuild_index(db)
+    # 3. Index the new resource
+    embedding_service.index_resource(new_res)
     
     return {"message": "Resource added with file", "id": str(new_res.id), "url": file_url}
 
@@ -90,16 +93,20 @@ def delete_resource(resource_id: str, db: Session = Depends(get_db)):
     db.delete(res)
     db.commit()
 
-    # 4. Rebuild index
-    embedding_service.rebuild_index(db)
+    # 4. Drop it from the index
+    embedding_service.remove_resource(resource_id)
 
     return {"message": "Resource deleted successfully", "id": resource_id}
 
 @router.get("/resources", response_model=List[ResourceRead])
-def get_resources(db: Session = Depends(get_db)):
+def get_resources(db: Session = Depends(get_read_db)):
     resources = db.query(Resource).all()
     return resources
 
 @router.get("/health")
 def health():
     return {"status": "ok", "index_size": vector_index.ntotal}
+
+@router.get("/metrics/db")
+def db_metrics():
+    return pool_stats()
@@ -12,9 +12,29 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.PG_USER}:{self.PG_PASSWORD}@{self.PG_HOST}:{self.PG_PORT}/{self.PG_DB}"
 
+    # Optional read replica for read-only queries (recommend, list)
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
+
+    # Connection pool, shared by the API and the consumer
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
     BERT_MODEL_NAME: str = "all-MiniLM-L6-v2"
     FAISS_DIMENSION: int = 384
 
+    # MMR re-ranking: candidates fetched = top_k * factor, capped to bound latency
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.7"))
+    MMR_CANDIDATE_FACTOR: int = int(os.getenv("MMR_CANDIDATE_FACTOR", "4"))
+    MMR_MAX_CANDIDATES: int = int(os.getenv("MMR_MAX_CANDIDATES", "100"))
+
+    # When set, API processes serve the index snapshot published here by the
+    # worker (python -m app.worker) instead of building their own index
+    INDEX_SNAPSHOT_DIR: str = os.getenv("INDEX_SNAPSHOT_DIR", "")
+    INDEX_SYNC_INTERVAL: float = float(os.getenv("INDEX_SYNC_INTERVAL", "5"))
+
     # MinIO Settings
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "minio:9000")
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
@@ -2,8 +2,23 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+def _create_engine(url):
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+
+engine = _create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Read-only queries go to the replica when one is configured
+read_engine = _create_engine(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -12,3 +27,26 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_stats(pool):
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "utilisation": round(pool.checkedout() / (pool.size() + settings.DB_MAX_OVERFLOW), 3)
+    }
+
+def pool_stats():
+    stats = {"primary": _pool_stats(engine.pool)}
+    if read_engine is not engine:
+        stats["replica"] = _pool_stats(read_engine.pool)
+    return stats
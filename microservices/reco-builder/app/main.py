@@ -2,6 +2,7 @@ from fastapi import FastAPI
 import py_eureka_client.eureka_client as eureka_client
 import os
 from app.api import endpoints
+from app.core.config import settings
 from app.core.database import SessionLocal, Base, engine
 from app.services.embeddings import embedding_service
 import uvicorn
@@ -27,16 +28,6 @@ async def startup_event():
         instance_host=INSTANCE_HOST
     )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Initial index build
-db = SessionLocal()
-try:
-    embedding_service.rebuild_index(db)
-finally:
-    db.close()
-
 app.include_router(endpoints.router)
 
 # Start RabbitMQ consumer in background
@@ -48,8 +39,22 @@ def run_consumer():
     except Exception as e:
         logger.error(f"Failed to start RabbitMQ consumer: {e}")
 
-consumer_thread = threading.Thread(target=run_consumer, daemon=True)
-consumer_thread.start()
+# With INDEX_SNAPSHOT_DIR set, the worker (python -m app.worker) owns table
+# creation, index writes and event consumption; API processes only read the
+# published snapshot. Otherwise everything runs in this process.
+if not settings.INDEX_SNAPSHOT_DIR:
+    # Create tables
+    Base.metadata.create_all(bind=engine)
+
+    # Initial index build
+    db = SessionLocal()
+    try:
+        embedding_service.rebuild_index(db)
+    finally:
+        db.close()
+
+    consumer_thread = threading.Thread(target=run_consumer, daemon=True)
+    consumer_thread.start()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8003)
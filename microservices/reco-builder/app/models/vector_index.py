@@ -1,29 +1,303 @@
+import os
+import time
+import uuid
 import faiss
 import numpy as np
 from app.core.config import settings
 
+# Resource UUIDs are kept as two 64-bit halves instead of Python strings
+UUID_DTYPE = np.dtype([('hi', '<u8'), ('lo', '<u8')])
+
+_LOW_MASK = (1 << 64) - 1
+_EMPTY = -1
+_DELETED = -2
+
+
+def _split_uuid(resource_id):
+    value = resource_id if isinstance(resource_id, uuid.UUID) else uuid.UUID(str(resource_id))
+    return value.int >> 64, value.int & _LOW_MASK
+
+
+def _join_uuid(entry):
+    return str(uuid.UUID(int=(int(entry['hi']) << 64) | int(entry['lo'])))
+
+
 class VectorIndex:
+    """
+    FAISS index plus a compact position <-> resource UUID mapping.
+
+    Positions map to UUIDs through a NumPy structured array; UUIDs map back to
+    positions through an open-addressing hash table of int32 slots. Removed
+    resources are tombstoned (O(1)) and the index is compacted once tombstones
+    outnumber live vectors.
+    """
+
+    read_only = False
+
     def __init__(self):
-        self.index = faiss.IndexFlatL2(settings.FAISS_DIMENSION)
-        self.resource_ids = []
+        self.reset()
 
     def reset(self, dimension=None):
         dim = dimension or settings.FAISS_DIMENSION
         self.index = faiss.IndexFlatL2(dim)
-        self.resource_ids = []
+        self._ids = np.zeros(0, dtype=UUID_DTYPE)
+        self._alive = np.zeros(0, dtype=bool)
+        self._deleted = 0
+        self._slots = np.full(8, _EMPTY, dtype=np.int32)
+        self._used_slots = 0
+
+    # --- uuid -> position hash table ---
+
+    def _probe(self, hi, lo):
+        """Returns (slot, position) for a UUID, position is -1 if absent."""
+        mask = len(self._slots) - 1
+        slot = lo & mask
+        while True:
+            pos = int(self._slots[slot])
+            if pos == _EMPTY:
+                return slot, -1
+            if pos >= 0:
+                entry = self._ids[pos]
+                if int(entry['hi']) == hi and int(entry['lo']) == lo:
+                    return slot, pos
+            slot = (slot + 1) & mask
+
+    def _insert_slot(self, lo, pos):
+        mask = len(self._slots) - 1
+        slot = lo & mask
+        while self._slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        if self._slots[slot] == _EMPTY:
+            self._used_slots += 1
+        self._slots[slot] = pos
+
+    def _rebuild_slots(self, min_entries=0):
+        live = np.flatnonzero(self._alive[:self.index.ntotal])
+        capacity = 8
+        while capacity < 2 * (max(len(live), min_entries) + 1):
+            capacity *= 2
+        self._slots = np.full(capacity, _EMPTY, dtype=np.int32)
+        self._used_slots = 0
+        for pos in live:
+            self._insert_slot(int(self._ids[pos]['lo']), int(pos))
+
+    # --- storage ---
+
+    def _reserve(self, count):
+        needed = self.index.ntotal + count
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids), 16)
+            ids = np.zeros(capacity, dtype=UUID_DTYPE)
+            ids[:len(self._ids)] = self._ids
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._ids, self._alive = ids, alive
+        if 2 * (self._used_slots + count + 1) > len(self._slots):
+            self._rebuild_slots(min_entries=self.ntotal + count)
+
+    def _compact(self):
+        size = self.index.ntotal
+        live = np.flatnonzero(self._alive[:size])
+        vectors = self.index.reconstruct_n(0, size)[live] if size else None
+        self.index = faiss.IndexFlatL2(self.index.d)
+        if len(live):
+            self.index.add(vectors)
+        self._ids = self._ids[live].copy()
+        self._alive = np.ones(len(live), dtype=bool)
+        self._deleted = 0
+        self._rebuild_slots()
 
     def add_embeddings(self, embeddings, ids):
-        self.index.add(np.array(embeddings).astype('float32'))
-        self.resource_ids.extend([str(i) for i in ids])
+        """Adds vectors for the given resource ids; an existing id is replaced."""
+        vectors = np.array(embeddings).astype('float32').reshape(len(ids), -1)
+        # An id given twice in one call keeps its last vector
+        latest = {}
+        for row, resource_id in enumerate(ids):
+            latest[_split_uuid(resource_id)] = row
+        if len(latest) < len(ids):
+            vectors = vectors[list(latest.values())]
+        keys = list(latest)
+        replaced = sum(self._remove_key(hi, lo) for hi, lo in keys)
+        self._reserve(len(keys))
+
+        start = self.index.ntotal
+        for offset, (hi, lo) in enumerate(keys):
+            self._ids[start + offset] = (hi, lo)
+            self._alive[start + offset] = True
+            self._insert_slot(lo, start + offset)
+        self.index.add(vectors)
+        if replaced:
+            self._maybe_compact()
+
+    def _remove_key(self, hi, lo):
+        slot, pos = self._probe(hi, lo)
+        if pos < 0:
+            return False
+        self._slots[slot] = _DELETED
+        self._alive[pos] = False
+        self._deleted += 1
+        return True
+
+    def remove(self, resource_id):
+        """Tombstones a resource. Returns False if it was not indexed."""
+        removed = self._remove_key(*_split_uuid(resource_id))
+        if removed:
+            self._maybe_compact()
+        return removed
+
+    def _maybe_compact(self):
+        if self._deleted > max(self.ntotal, 32):
+            self._compact()
+
+    def position_of(self, resource_id):
+        return self._probe(*_split_uuid(resource_id))[1]
+
+    def resource_id_at(self, position):
+        return _join_uuid(self._ids[position])
+
+    def live_ids(self):
+        live = np.flatnonzero(self._alive[:self.index.ntotal])
+        return [_join_uuid(entry) for entry in self._ids[live]]
 
-    def search(self, query_vector, top_k):
-        if self.index.ntotal == 0:
-            return [], []
-        distances, indices = self.index.search(np.array(query_vector).astype('float32'), top_k)
-        return distances[0], indices[0]
+    def __contains__(self, resource_id):
+        return self.position_of(resource_id) >= 0
+
+    def reconstruct(self, positions):
+        """Returns the stored vectors for the given positions."""
+        return self.index.reconstruct_batch(np.asarray(positions, dtype='int64'))
+
+    def search_positions(self, query_vector, top_k):
+        """Nearest live positions, only meaningful until the index is next modified."""
+        if self.ntotal == 0:
+            return np.zeros(0, dtype='float32'), np.zeros(0, dtype='int64')
+        # Over-fetch by the number of tombstones so top_k live hits survive filtering
+        k = min(top_k + self._deleted, self.index.ntotal)
+        distances, indices = self.index.search(np.array(query_vector).astype('float32'), k)
+        distances, indices = distances[0], indices[0]
+        keep = (indices >= 0) & self._alive[np.maximum(indices, 0)]
+        distances, indices = distances[keep], indices[keep]
+        return distances[:top_k], indices[:top_k]
+
+    def search(self, query_vector, top_k, with_vectors=False):
+        """
+        Returns (distances, resource_ids, vectors) of the top_k nearest resources;
+        vectors is None unless with_vectors is set.
+        """
+        distances, positions = self.search_positions(query_vector, top_k)
+        vectors = self.reconstruct(positions) if with_vectors and len(positions) else None
+        return distances, [self.resource_id_at(pos) for pos in positions], vectors
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal - self._deleted
+
+    @property
+    def nbytes(self):
+        """Memory held by the id mapping (excluding the vectors themselves)."""
+        return self._ids.nbytes + self._alive.nbytes + self._slots.nbytes
+
+    def publish_snapshot(self, directory):
+        """
+        Writes the live vectors and ids as .npy files readable by IndexSnapshot.
+
+        Files are versioned and the CURRENT pointer is swapped atomically, so
+        readers never see a half-written snapshot.
+        """
+        os.makedirs(directory, exist_ok=True)
+        size = self.index.ntotal
+        live = np.flatnonzero(self._alive[:size])
+        vectors = self.index.reconstruct_n(0, size)[live] if size else np.zeros((0, self.index.d), dtype='float32')
+        version = str(time.time_ns())
+
+        np.save(os.path.join(directory, f"vectors-{version}.npy"), vectors)
+        np.save(os.path.join(directory, f"norms-{version}.npy"), np.einsum('ij,ij->i', vectors, vectors))
+        np.save(os.path.join(directory, f"ids-{version}.npy"), self._ids[live])
+
+        pointer = os.path.join(directory, "CURRENT")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(pointer + ".tmp", pointer)
+
+        # Keep the previous version for readers that have just read CURRENT;
+        # anything older can go (existing mappings stay valid after unlink)
+        versions = sorted({name.rsplit("-", 1)[1][:-4] for name in os.listdir(directory) if name.endswith(".npy")}, key=int)
+        for old in versions[:-2]:
+            for name in ("vectors", "norms", "ids"):
+                os.remove(os.path.join(directory, f"{name}-{old}.npy"))
+        return version
+
+
+class IndexSnapshot:
+    """
+    Read-only view of the index published by the reco-builder worker.
+
+    Vectors are memory-mapped, so every API process shares the same page
+    cache instead of holding a private copy. Search is exact L2 (same
+    squared distances as IndexFlatL2) computed in NumPy.
+
+    The vectors, norms and ids of one version are swapped in as a single
+    tuple, and a search resolves its hits against the tuple it scored, so
+    a concurrent refresh can never mix two versions.
+    """
+
+    read_only = True
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._pointer_mtime = None
+        # (version, vectors, norms, ids)
+        self._current = (
+            None,
+            np.zeros((0, settings.FAISS_DIMENSION), dtype='float32'),
+            np.zeros(0, dtype='float32'),
+            np.zeros(0, dtype=UUID_DTYPE)
+        )
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def refresh(self):
+        """Maps the latest published snapshot if CURRENT has changed."""
+        pointer = os.path.join(self.directory, "CURRENT")
+        try:
+            mtime = os.stat(pointer).st_mtime_ns
+        except FileNotFoundError:
+            return self._current
+        if mtime == self._pointer_mtime:
+            return self._current
+        with open(pointer) as f:
+            version = f.read().strip()
+        if version != self.version:
+            files = {name: os.path.join(self.directory, f"{name}-{version}.npy") for name in ("vectors", "norms", "ids")}
+            self._current = (
+                version,
+                np.load(files["vectors"], mmap_mode='r'),
+                np.load(files["norms"], mmap_mode='r'),
+                np.load(files["ids"], mmap_mode='r')
+            )
+        self._pointer_mtime = mtime
+        return self._current
+
+    def search(self, query_vector, top_k, with_vectors=False):
+        """
+        Returns (distances, resource_ids, vectors) of the top_k nearest resources;
+        vectors is None unless with_vectors is set.
+        """
+        _, vectors, norms, ids = self.refresh()
+        if len(ids) == 0:
+            return np.zeros(0, dtype='float32'), [], None
+        query = np.asarray(query_vector, dtype='float32').reshape(-1)
+        distances = np.maximum(norms - 2 * (vectors @ query) + query @ query, 0)
+        k = min(top_k, len(distances))
+        indices = np.argpartition(distances, k - 1)[:k]
+        indices = indices[np.argsort(distances[indices])]
+        hits = np.asarray(vectors[indices]) if with_vectors else None
+        return distances[indices], [_join_uuid(entry) for entry in ids[indices]], hits
 
     @property
     def ntotal(self):
-        return self.index.ntotal
+        return len(self.refresh()[3])
+
 
-vector_index = VectorIndex()
+vector_index = IndexSnapshot(settings.INDEX_SNAPSHOT_DIR) if settings.INDEX_SNAPSHOT_DIR else VectorIndex()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional
 from uuid import UUID
 
@@ -24,6 +24,9 @@ class RecommendationRequest(BaseModel):
     student_id: Optional[str] = None
     student_profile: Optional[str] = None
     risk_level: Optional[str] = None
+    diversify: Optional[bool] = False
+    # MMR trade-off: 1 = relevance only, 0 = diversity only
+    diversity_lambda: Optional[float] = Field(None, ge=0, le=1)
 
 class Recommendation(BaseModel):
     id: str
@@ -0,0 +1,35 @@
+import numpy as np
+
+def mmr_select(query_vector, candidate_vectors, top_k, diversity_lambda):
+    """
+    Maximal marginal relevance over a candidate set.
+
+    Returns the indices (into candidate_vectors) of the selected items, in
+    selection order. Similarities are cosine, computed once as a matrix; only
+    the top_k greedy steps are sequential.
+    """
+    candidates = candidate_vectors / np.maximum(np.linalg.norm(candidate_vectors, axis=1, keepdims=True), 1e-12)
+    query = np.ravel(query_vector)
+    query = query / max(np.linalg.norm(query), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    n = len(candidates)
+    top_k = min(top_k, n)
+    selected = np.empty(top_k, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    max_sim = np.full(n, -np.inf, dtype=similarity.dtype)
+
+    for step in range(top_k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = diversity_lambda * relevance - (1 - diversity_lambda) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        max_sim = np.maximum(max_sim, similarity[best])
+
+    return selected
@@ -1,22 +1,57 @@
+import uuid
 from app.models.bert_model import bert_model
 from app.models.vector_index import vector_index
 from app.models.domain import Resource
 from sqlalchemy.orm import Session
 
 class EmbeddingService:
+    def __init__(self, index=vector_index):
+        self.index = index
+
     def rebuild_index(self, db: Session):
+        if self.index.read_only:
+            # Index writes are owned by the worker process
+            return
         print("Rebuilding Faiss index...")
         resources = db.query(Resource).all()
         if not resources:
             print("No resources found in DB to index.")
-            vector_index.reset()
+            self.index.reset()
             return
 
         descriptions = [r.description for r in resources]
         embeddings = bert_model.encode(descriptions)
         
-        vector_index.reset()
-        vector_index.add_embeddings(embeddings, [r.id for r in resources])
+        self.index.reset()
+        self.index.add_embeddings(embeddings, [r.id for r in resources])
         print(f"Indexed {len(resources)} resources.")
 
+    def sync_index(self, db: Session) -> bool:
+        """Encodes resources missing from the index and drops deleted ones. Returns True if anything changed."""
+        db_ids = {str(row.id) for row in db.query(Resource.id).all()}
+        indexed = set(self.index.live_ids())
+
+        for resource_id in indexed - db_ids:
+            self.index.remove(resource_id)
+
+        missing = db_ids - indexed
+        if missing:
+            resources = db.query(Resource).filter(Resource.id.in_([uuid.UUID(i) for i in missing])).all()
+            embeddings = bert_model.encode([r.description for r in resources])
+            self.index.add_embeddings(embeddings, [r.id for r in resources])
+            print(f"Indexed {len(resources)} new resources.")
+
+        return bool(missing or indexed - db_ids)
+
+    def index_resource(self, resource: Resource):
+        if self.index.read_only:
+            return
+        embeddings = bert_model.encode([resource.description])
+        self.index.add_embeddings(embeddings, [resource.id])
+
+    def remove_resource(self, resource_id):
+        if self.index.read_only:
+            return
+        self.index.remove(resource_id)
+
 embedding_service = EmbeddingService()
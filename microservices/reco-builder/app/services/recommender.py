@@ -1,38 +1,60 @@
+import uuid
 from sqlalchemy.orm import Session
 import numpy as np
+from app.core.config import settings
 from app.models.vector_index import vector_index
 from app.models.bert_model import bert_model
 from app.models.domain import Resource
 from app.services.student_context import student_context_service
+from app.services.diversity import mmr_select
 
 class RecommenderService:
-    def get_recommendations(self, db: Session, query: str, top_k: int, student_id: str = None, student_profile: str = None, risk_level: str = None):
+    def get_recommendations(self, db: Session, query: str, top_k: int, student_id: str = None, student_profile: str = None, risk_level: str = None, diversify: bool = False, diversity_lambda: float = None):
         if vector_index.ntotal == 0:
-            return [], query, query
+            return [], query
 
         augmented_query = student_context_service.augment_query(query, student_profile, risk_level)
-        
+
         # Encode query
         query_vector = bert_model.encode([augmented_query])
-        
+
         # Search
-        distances, indices = vector_index.search(query_vector, top_k)
-        
+        if diversify:
+            distances, resource_ids = self._search_diverse(query_vector, top_k, diversity_lambda)
+        else:
+            distances, resource_ids, _ = vector_index.search(query_vector, top_k)
+
+        # Hydrate all hits with a single query, then restore ranking order
+        hits = [(float(distance), res_id) for distance, res_id in zip(distances, resource_ids)]
+        resources = db.query(Resource).filter(Resource.id.in_([uuid.UUID(res_id) for _, res_id in hits])).all() if hits else []
+        by_id = {str(r.id): r for r in resources}
+
         recommendations = []
-        for i, idx in enumerate(indices):
-            if idx != -1 and idx < len(vector_index.resource_ids):
-                res_id = vector_index.resource_ids[idx]
-                res = db.query(Resource).filter(Resource.id == res_id).first()
-                if res:
-                    recommendations.append({
-                        "id": str(res.id),
-                        "title": res.title,
-                        "type": res.type,
-                        "url": res.url,
-                        "distance": float(distances[i]),
-                        "relevance_boosted": augmented_query != query
-                    })
-        
+        for distance, res_id in hits:
+            res = by_id.get(res_id)
+            if res:
+                recommendations.append({
+                    "id": str(res.id),
+                    "title": res.title,
+                    "type": res.type,
+                    "url": res.url,
+                    "distance": distance,
+                    "relevance_boosted": augmented_query != query
+                })
+
         return recommendations, augmented_query
 
+    def _search_diverse(self, query_vector, top_k, diversity_lambda=None):
+        """Over-fetches nearest neighbours and re-ranks them with MMR."""
+        if diversity_lambda is None:
+            diversity_lambda = settings.MMR_LAMBDA
+        n_candidates = max(min(top_k * settings.MMR_CANDIDATE_FACTOR, settings.MMR_MAX_CANDIDATES), top_k)
+
+        distances, resource_ids, candidate_vectors = vector_index.search(query_vector, n_candidates, with_vectors=True)
+        if len(resource_ids) <= top_k:
+            return distances, resource_ids
+
+        order = mmr_select(query_vector, candidate_vectors, top_k, diversity_lambda)
+        return distances[order], [resource_ids[i] for i in order]
+
 recommender_service = RecommenderService()
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.database import SessionLocal, Base, engine
+from app.models.vector_index import VectorIndex
+from app.services.embeddings import EmbeddingService
+from app.services.consumer import run_consumer
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# The worker is the single writer of the index: it keeps its own in-memory
+# FAISS index in sync with the resources table and publishes a snapshot that
+# the API processes memory-map (settings.INDEX_SNAPSHOT_DIR).
+index = VectorIndex()
+indexer = EmbeddingService(index)
+
+def sync_and_publish(force: bool = False):
+    with SessionLocal() as db:
+        changed = indexer.sync_index(db)
+    if changed or force:
+        version = index.publish_snapshot(settings.INDEX_SNAPSHOT_DIR)
+        logger.info(f" [✓] Published index snapshot {version} ({index.ntotal} resources)")
+
+async def run_indexer():
+    while True:
+        try:
+            await asyncio.to_thread(sync_and_publish)
+        except Exception as e:
+            logger.error(f" [!] Index sync failed: {e}")
+        await asyncio.sleep(settings.INDEX_SYNC_INTERVAL)
+
+async def main():
+    if not settings.INDEX_SNAPSHOT_DIR:
+        raise SystemExit("INDEX_SNAPSHOT_DIR must be set to run the reco-builder worker.")
+
+    Base.metadata.create_all(bind=engine)
+    # Always publish once so API processes have a snapshot, even if empty
+    await asyncio.to_thread(sync_and_publish, True)
+
+    await asyncio.gather(run_indexer(), run_consumer())
+
+if __name__ == "__main__":
+    asyncio.run(main())
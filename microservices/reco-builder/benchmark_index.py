@@ -0,0 +1,75 @@
+import sys
+import time
+import uuid
+import numpy as np
+from app.models.vector_index import VectorIndex
+from app.services.diversity import mmr_select
+
+# Benchmark du VectorIndex sans BERT ni base de données (vecteurs aléatoires)
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+DIM = 384
+TOP_K = 5
+MMR_CANDIDATES = 20
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_benchmark():
+    print(f"=== BENCHMARK VECTOR INDEX ({N} ressources, dim={DIM}) ===\n")
+    rng = np.random.default_rng(42)
+    vectors = rng.random((N, DIM), dtype=np.float32)
+    ids = [uuid.uuid4() for _ in range(N)]
+
+    index = VectorIndex()
+    _, add_ms = timed(index.add_embeddings, vectors, ids)
+    print(f"add_embeddings : {add_ms:.1f} ms")
+
+    # Ancien format : liste de UUID sous forme de str
+    legacy = [str(i) for i in ids]
+    legacy_bytes = sys.getsizeof(legacy) + sum(sys.getsizeof(s) for s in legacy)
+    print(f"Mapping ids    : {index.nbytes / N:.1f} octets/ressource (liste de str : {legacy_bytes / N:.1f})")
+
+    sample = ids[:1000]
+    start = time.perf_counter()
+    for rid in sample:
+        index.position_of(rid)
+    print(f"position_of    : {(time.perf_counter() - start) * 1e6 / len(sample):.2f} µs/appel")
+
+    start = time.perf_counter()
+    for rid in sample:
+        index.remove(rid)
+    print(f"remove         : {(time.perf_counter() - start) * 1e6 / len(sample):.2f} µs/appel")
+
+    _, readd_ms = timed(index.add_embeddings, vectors[:1000], sample)
+    print(f"re-add (1000)  : {readd_ms:.1f} ms")
+
+    query = rng.random((1, DIM), dtype=np.float32)
+    latencies = []
+    for _ in range(50):
+        _, ms = timed(index.search, query, TOP_K)
+        latencies.append(ms)
+    print(f"search top-{TOP_K}  : p50={np.percentile(latencies, 50):.2f} ms p99={np.percentile(latencies, 99):.2f} ms")
+
+    # Re-ranking MMR : sur-échantillonnage FAISS + reconstruction + sélection
+    def search_mmr():
+        distances, resource_ids, vectors = index.search(query, MMR_CANDIDATES, with_vectors=True)
+        order = mmr_select(query, vectors, TOP_K, 0.7)
+        return distances[order], [resource_ids[i] for i in order]
+
+    mmr_latencies = []
+    for _ in range(50):
+        _, ms = timed(search_mmr)
+        mmr_latencies.append(ms)
+    overhead = np.percentile(mmr_latencies, 50) - np.percentile(latencies, 50)
+    print(f"search MMR     : p50={np.percentile(mmr_latencies, 50):.2f} ms p99={np.percentile(mmr_latencies, 99):.2f} ms "
+          f"(surcoût p50 {overhead:+.2f} ms, {MMR_CANDIDATES} candidats)")
+
+    print("\n" + "=" * 50)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from app.services.consumer import ProfileUpdateConsumer
+
+# Vérifie le consumer RabbitMQ avec un broker en mémoire (sans RabbitMQ)
+
+class InMemoryMessage:
+    def __init__(self, body: bytes, routing_key: str, redelivered: bool = False):
+        self.body = body
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self.state = "pending"
+
+    async def ack(self):
+        self.state = "acked"
+
+    async def nack(self, requeue: bool = True):
+        self.state = "requeued" if requeue else "dropped"
+
+    async def reject(self, requeue: bool = False):
+        self.state = "rejected"
+
+
+class InMemoryQueue:
+    def __init__(self, name):
+        self.name = name
+        self.callback = None
+
+    async def consume(self, callback):
+        self.callback = callback
+
+
+class InMemoryExchange:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def publish(self, message, routing_key):
+        self.broker.dead_letters.setdefault(routing_key, []).append(json.loads(message.body))
+
+
+class InMemoryChannel:
+    def __init__(self, broker):
+        self.broker = broker
+        self.default_exchange = InMemoryExchange(broker)
+
+    async def set_qos(self, prefetch_count: int):
+        self.broker.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name, durable=True):
+        return self.broker.queues.setdefault(name, InMemoryQueue(name))
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self.queues = {}
+        self.dead_letters = {}
+        self.prefetch_count = None
+
+    async def connect(self, url):
+        return self
+
+    async def channel(self):
+        return InMemoryChannel(self)
+
+    async def close(self):
+        pass
+
+    async def publish(self, queue, payload):
+        message = InMemoryMessage(json.dumps(payload).encode(), queue)
+        await self.queues[queue].callback(message)
+        return message
+
+
+async def run_check():
+    print("=== CHECK CONSUMER RECOBUILDER (broker en mémoire) ===\n")
+    broker = InMemoryBroker()
+    handled = []
+
+    def handler(data):
+        if data.get("riskLevel") == "Boom":
+            raise RuntimeError("échec simulé")
+        handled.append(data)
+
+    consumer = ProfileUpdateConsumer(handler=handler, connect=broker.connect, prefetch_count=16,
+                                     concurrency=4, coalesce_window=0.05, retry_backoff=0.01)
+    await consumer.start()
+    print(f"Prefetch: {broker.prefetch_count} | Queues: {list(broker.queues)}")
+
+    # 3 mises à jour du même étudiant dans la fenêtre -> 1 seul traitement
+    messages = [
+        await broker.publish("profile_updated", {"studentId": "42", "riskLevel": level})
+        for level in ("Low", "Medium", "High")
+    ]
+    messages.append(await broker.publish("profile_updated", {"studentId": "7", "riskLevel": "Low"}))
+    failing = await broker.publish("student_features_updated", {"studentId": "9", "riskLevel": "Boom"})
+    # JSON valide mais pas un objet -> file d'erreurs sans traitement
+    not_object = await broker.publish("profile_updated", ["studentId", "5"])
+    await consumer.stop()
+
+    print(f"Traitements: {len(handled)} (attendu 2)")
+    print(f"Dernier état étudiant 42: {[d['riskLevel'] for d in handled if d['studentId'] == '42']}")
+    print(f"Messages acquittés: {sum(m.state == 'acked' for m in messages)}/{len(messages)}")
+    print(f"Message en échec: {failing.state} (attendu acked, après {consumer.retries} nouvelles tentatives)")
+    print(f"Message non-objet: {not_object.state} (attendu acked)")
+    print(f"File d'erreurs: {broker.dead_letters} (attendu l'étudiant 9 dans student_features_updated.dlq, "
+          f"la liste dans profile_updated.dlq)")
+    print("\n" + "=" * 50)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_check())
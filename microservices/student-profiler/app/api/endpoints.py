@@ -1,22 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.schemas.pydantic_models import StudentFeatures, PredictionResult
+from app.schemas.pydantic_models import StudentFeatures, PredictionResult, BatchStudentFeatures, BatchPredictionResult, ProfileBatchGetRequest, \
+    ProfileTransition, CohortTransitionsQuery, TransitionCount
 from app.services.profiler import profiling_service
+from app.services.online_kmeans import online_kmeans
+from app.services.inference_executor import inference_executor, InferenceOverloaded
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.repositories.profile_repository import profile_repository
+from app.services import profile_export
+from app.services.profile_cache import profile_cache, profile_to_dict, profile_etag
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _overloaded(e: InferenceOverloaded) -> HTTPException:
+    logger.warning(f"Prediction refused: {e}")
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": "1"})
+
 @router.post("/predict_clusters", response_model=PredictionResult, status_code=status.HTTP_200_OK)
-def predict_clusters(features: StudentFeatures, db: Session = Depends(get_db)):
+async def predict_clusters(features: StudentFeatures, db: Session = Depends(get_db)):
     """
     Receives student features, applies the ML pipeline, updates the database, 
     and returns the predicted cluster profile.
+
+    Runs on the dedicated inference executor; answers 429 when it is saturated.
     """
     try:
-        result = profiling_service.predict_profile(features, db)
+        result = await asyncio.wrap_future(inference_executor.submit(profiling_service.predict_profile, features, db))
         return result
+    except InferenceOverloaded as e:
+        raise _overloaded(e)
     except ValueError as ve:
         logger.error(f"Validation Error: {ve}")
         raise HTTPException(status_code=503, detail=str(ve))
@@ -24,25 +45,29 @@ def predict_clusters(features: StudentFeatures, db: Session = Depends(get_db)):
         logger.error(f"Internal Server Error: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error during prediction.")
 
+@router.post("/predict_clusters/batch", response_model=BatchPredictionResult, status_code=status.HTTP_200_OK)
+async def predict_clusters_batch(batch: BatchStudentFeatures, db: Session = Depends(get_db)):
+    """
+    Profiles many students at once: a single pipeline run over the feature
+    matrix and a single bulk upsert of the resulting profiles.
+    """
+    if len(batch.students) > settings.PREDICT_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {settings.PREDICT_BATCH_LIMIT} students per request.")
+    try:
+        results = await asyncio.wrap_future(inference_executor.submit(profiling_service.predict_profiles_batch, batch.students, db))
+        return {"count": len(results), "results": results}
+    except InferenceOverloaded as e:
+        raise _overloaded(e)
+    except ValueError as ve:
+        logger.error(f"Validation Error: {ve}")
+        raise HTTPException(status_code=503, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Internal Server Error: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error during batch prediction.")
+
 from app.models.domain import StudentProfile
 
-@router.get("/profile/{student_id}")
-def get_student_profile(student_id: str, db: Session = Depends(get_db)):
-    """
-    Retrieves the profile for a specific student from the database.
-    """
-    profile = db.query(StudentProfile).filter(StudentProfile.student_id == student_id).first()
-    
-    if profile:
-        return {
-            "student_id": profile.student_id,
-            "mean_score": profile.mean_score,
-            "progress_rate": profile.progress_rate,
-            "cluster_id": profile.cluster_id,
-            "profile_name": profile.profil_type,
-            "risk_level": profile.risk_level
-        }
-    
+def _unknown_profile(student_id: str) -> dict:
     # Fallback for unknown students (or those not yet analyzed)
     return {
         "student_id": student_id,
@@ -50,5 +75,188 @@ def get_student_profile(student_id: str, db: Session = Depends(get_db)):
         "progress_rate": 0.0,
         "cluster_id": -1,
         "profile_name": "Non démarré (Not Started)",
-        "risk_level": "High"
+        "risk_level": "High",
+        "model_version": None
+    }
+
+@router.get("/profile/{student_id}")
+def get_student_profile(student_id: str, response: Response, db: Session = Depends(get_db),
+                        if_none_match: Optional[str] = Header(None)):
+    """
+    Retrieves the profile for a specific student, through the in-process
+    profile cache. Supports ETag / If-None-Match revalidation.
+    """
+    profile = profile_cache.get(student_id)
+    if profile is None:
+        row = db.query(StudentProfile).filter(StudentProfile.student_id == student_id).first()
+        if row is None:
+            return _unknown_profile(student_id)
+        profile = profile_to_dict(row)
+        profile_cache.put(profile)
+
+    etag = profile_etag(profile)
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return profile
+
+@router.post("/profiles:batchGet")
+def batch_get_profiles(request: ProfileBatchGetRequest, db: Session = Depends(get_db)):
+    """
+    Returns the profiles of many students in one round trip, in request order.
+    Cache misses are loaded with a single query.
+    """
+    student_ids = list(dict.fromkeys(request.student_ids))
+    if len(student_ids) > settings.PROFILE_BATCH_GET_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {settings.PROFILE_BATCH_GET_LIMIT} student ids per request.")
+
+    profiles = {}
+    for student_id in student_ids:
+        profile = profile_cache.get(student_id)
+        if profile is not None:
+            profiles[student_id] = profile
+
+    missing = [student_id for student_id in student_ids if student_id not in profiles]
+    if missing:
+        loaded = [profile_to_dict(row) for row in profile_repository.get_profiles(db, missing).values()]
+        profile_cache.put_many(loaded)
+        profiles.update((profile["student_id"], profile) for profile in loaded)
+
+    return {
+        "profiles": [profiles.get(student_id) or _unknown_profile(student_id) for student_id in student_ids]
     }
+
+def _history_window(since: Optional[datetime], until: Optional[datetime]):
+    # Naive timestamps are taken as UTC
+    if until is not None and until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=90)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be before 'until'.")
+    if until - since > timedelta(days=settings.HISTORY_MAX_WINDOW_DAYS):
+        raise HTTPException(status_code=400, detail=f"Window exceeds {settings.HISTORY_MAX_WINDOW_DAYS} days.")
+    return since, until
+
+@router.get("/profile/{student_id}/transitions", response_model=List[ProfileTransition])
+def get_student_transitions(student_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            db: Session = Depends(get_db)):
+    """
+    Cluster changes of one student in [since, until) (default: last 90 days),
+    oldest first. The first profile of a student has no previous cluster.
+    """
+    since, until = _history_window(since, until)
+    return profile_repository.get_transitions(db, student_id, since, until)
+
+@router.post("/profiles/transitions", response_model=List[TransitionCount])
+def get_cohort_transitions(query: CohortTransitionsQuery, db: Session = Depends(get_db)):
+    """
+    Counts cluster transitions (previous -> new cluster) over a time window,
+    for the given students or for everyone.
+    """
+    since, until = _history_window(query.since, query.until)
+    return [
+        TransitionCount(previous_cluster_id=row.previous_cluster_id, cluster_id=row.cluster_id,
+                        students=row.students, transitions=row.transitions)
+        for row in profile_repository.count_transitions(db, since, until, query.student_ids)
+    ]
+
+@router.get("/profiles/distribution")
+def get_profile_distribution(db: Session = Depends(get_db)):
+    """
+    Number of students per cluster and risk level, read from the counters the
+    profile upsert maintains (one row per cluster/risk pair, no profile scan).
+    """
+    rows = profile_repository.get_counters(db)
+    clusters = {}
+    for row in rows:
+        cluster = clusters.setdefault(row.cluster_id, {
+            "cluster_id": row.cluster_id,
+            "profile_name": profiling_service.cluster_profile_map.get(row.cluster_id, "Unknown"),
+            "count": 0,
+            "risk_levels": {}
+        })
+        cluster["count"] += row.count
+        cluster["risk_levels"][row.risk_level] = row.count
+    return {"total": sum(row.count for row in rows), "clusters": list(clusters.values())}
+
+@router.get("/profiles/export")
+def export_profiles(format: str = "ndjson", cluster_id: Optional[List[int]] = Query(None),
+                    risk_level: Optional[List[str]] = Query(None), updated_since: Optional[datetime] = None):
+    """
+    Streams student profiles as NDJSON, CSV or an Arrow IPC stream, read
+    through a server-side cursor in fixed-size chunks (constant memory).
+    Filters: cluster_id and risk_level (repeatable), updated_since.
+    """
+    if format not in profile_export.ENCODERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}' (use ndjson, csv or arrow).")
+    if format == "arrow" and not profile_export.arrow_available():
+        raise HTTPException(status_code=400, detail="Arrow export requires pyarrow to be installed.")
+
+    stmt = profile_export.export_query(cluster_id, risk_level, updated_since)
+    body = profile_export.ENCODERS[format](profile_export.iter_chunks(stmt))
+    extension = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}[format]
+    return StreamingResponse(
+        body,
+        media_type=profile_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="student_profiles.{extension}"'}
+    )
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    /admin endpoints need X-Admin-Token = ADMIN_TOKEN. Without ADMIN_TOKEN
+    they are only served to clients on the same host.
+    """
+    if settings.ADMIN_TOKEN:
+        if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token.")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are local-only while ADMIN_TOKEN is not set.")
+
+@router.get("/admin/model", dependencies=[Depends(require_admin)])
+def get_model_info():
+    """Serving model version and the versions available in the model store."""
+    model = profiling_service.model
+    return {
+        "serving": model.describe() if model else None,
+        "available": profiling_service.store.versions(),
+        "online_kmeans": online_kmeans.stats(),
+    }
+
+@router.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+def reload_model(version: Optional[str] = None):
+    """
+    Loads `version` (default: the store's current version) and swaps it in.
+    In-flight predictions finish on the previous model. The version is made
+    CURRENT in the model store, so the other workers and the consumer
+    process follow within MODEL_WATCH_INTERVAL.
+    """
+    previous = profiling_service.model_version
+    try:
+        model = profiling_service.load_model(version)
+        if version is not None:
+            profiling_service.store.set_current(model.version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Model reload failed: {e}")
+    return {"previous_version": previous, "serving": model.describe()}
+
+@router.post("/admin/profiles/counters/rebuild", dependencies=[Depends(require_admin)])
+def rebuild_profile_counters(db: Session = Depends(get_db)):
+    """Recomputes the distribution counters from student_profiles."""
+    profile_repository.rebuild_counters(db)
+    return {"status": "rebuilt"}
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    In-process service metrics: counters, gauges (e.g. publisher queue depth)
+    and latency percentiles.
+    """
+    return metrics.snapshot()
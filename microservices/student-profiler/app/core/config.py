@@ -14,6 +14,43 @@ class Settings(BaseSettings):
         return f"postgresql://{self.PG_USER}:{self.PG_PASSWORD}@{self.PG_HOST}:{self.PG_PORT}/{self.PG_DB}"
 
     MODEL_FILENAME: str = "student_profiler_model.joblib"
+    # Directory of versioned models (<version>.joblib + optional CURRENT); empty = MODEL_FILENAME only
+    MODEL_DIR: str = os.getenv("MODEL_DIR", "")
+    # How often every process checks the model store for a new CURRENT version (seconds, 0 = never)
+    MODEL_WATCH_INTERVAL: float = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+    # Background work started by the API process once it is ready; run the
+    # consumer in one designated process when serving with several workers
+    RUN_CONSUMER: bool = os.getenv("RUN_CONSUMER", "true").lower() == "true"
+    RUN_OUTBOX_RELAY: bool = os.getenv("RUN_OUTBOX_RELAY", "true").lower() == "true"
+    # Prediction requests: worker threads, waiting requests before 429, and
+    # how long a request may wait for a worker before it is shed
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "4"))
+    INFERENCE_MAX_QUEUE: int = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+    INFERENCE_QUEUE_TIMEOUT: float = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_MS", "2000")) / 1000
+    # Online mini-batch KMeans: batch predictions pull the centroids toward the
+    # students they assign (enable in one process, e.g. the consumer)
+    ONLINE_KMEANS_ENABLED: bool = os.getenv("ONLINE_KMEANS_ENABLED", "false").lower() == "true"
+    ONLINE_KMEANS_LEARNING_RATE: float = float(os.getenv("ONLINE_KMEANS_LEARNING_RATE", "0.0001"))
+    # Snapshots are written to MODEL_DIR as new versions and made CURRENT
+    ONLINE_KMEANS_SNAPSHOT_INTERVAL: float = float(os.getenv("ONLINE_KMEANS_SNAPSHOT_INTERVAL", "3600"))
+    ONLINE_KMEANS_SNAPSHOT_KEEP: int = int(os.getenv("ONLINE_KMEANS_SNAPSHOT_KEEP", "24"))
+    # Required in X-Admin-Token by /admin endpoints; when empty they only answer localhost
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # In-process cache for GET /profile (0 entries disables it)
+    PROFILE_CACHE_SIZE: int = int(os.getenv("PROFILE_CACHE_SIZE", "50000"))
+    PROFILE_CACHE_TTL: float = float(os.getenv("PROFILE_CACHE_TTL", "30"))
+    # Upper bound on ids accepted by POST /profiles:batchGet
+    PROFILE_BATCH_GET_LIMIT: int = int(os.getenv("PROFILE_BATCH_GET_LIMIT", "1000"))
+    # Upper bound on students accepted by POST /predict_clusters/batch
+    PREDICT_BATCH_LIMIT: int = int(os.getenv("PREDICT_BATCH_LIMIT", "1000"))
+
+    # Monthly profile history partitions created ahead of time
+    HISTORY_PARTITION_MONTHS_AHEAD: int = int(os.getenv("HISTORY_PARTITION_MONTHS_AHEAD", "3"))
+    # How often running processes create the upcoming partitions (seconds)
+    PARTITION_MAINTENANCE_INTERVAL: float = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+    # Upper bound on the window of a transitions query
+    HISTORY_MAX_WINDOW_DAYS: int = int(os.getenv("HISTORY_MAX_WINDOW_DAYS", "366"))
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 import logging
+from datetime import date
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,73 @@ except Exception as e:
     logger.error(f"Error configuring database connection: {e}")
     raise e
 
+# create_all only creates missing tables; columns added to existing tables
+# since the first release are applied here (idempotent, PostgreSQL only)
+SCHEMA_UPGRADES = [
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS feature_fingerprint VARCHAR(32)",
+    "ALTER TABLE student_profiles ADD COLUMN IF NOT EXISTS model_version VARCHAR(64)",
+]
+
+# Tables declared with postgresql_partition_by RANGE on a timestamp column -> that column
+MONTHLY_PARTITIONED_TABLES = {"student_profile_history": "recorded_at"}
+
+def ensure_monthly_partitions(conn, table: str, months_ahead: int = settings.HISTORY_PARTITION_MONTHS_AHEAD):
+    """
+    Creates the partitions of `table` for the current month and the next
+    `months_ahead` months, plus a DEFAULT partition so writes never fail
+    when maintenance falls behind. Idempotent.
+
+    Rows that landed in DEFAULT for a month that is only now being created
+    are moved into the new partition (PostgreSQL refuses to create it
+    otherwise). Concurrent callers are serialized by an advisory lock.
+    """
+    column = MONTHLY_PARTITIONED_TABLES[table]
+    default = f"{table}_default"
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"partitions:{table}"})
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT"))
+
+    today = date.today()
+    first = date(today.year, today.month, 1)
+    for offset in range(months_ahead + 1):
+        year, month = divmod(first.month - 1 + offset, 12)
+        start = date(first.year + year, month + 1, 1)
+        year, month = divmod(start.month, 12)
+        end = date(start.year + year, month + 1, 1)
+        partition = f"{table}_{start:%Y_%m}"
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": partition}).scalar() is not None:
+            continue
+
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = f"{column} >= '{start.isoformat()}' AND {column} < '{end.isoformat()}'"
+        stranded = conn.execute(text(f"SELECT count(*) FROM {default} WHERE {in_range}")).scalar()
+        if not stranded:
+            conn.execute(text(f"CREATE TABLE {partition} PARTITION OF {table} {bounds}"))
+            continue
+        # Writers wait on the parent's lock until the transaction commits
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+        conn.execute(text(f"CREATE TABLE {partition} PARTITION OF {table} {bounds}"))
+        conn.execute(text(f"INSERT INTO {table} SELECT * FROM {default} WHERE {in_range}"))
+        conn.execute(text(f"DELETE FROM {default} WHERE {in_range}"))
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+        logger.info(f"Created partition {partition} and moved {stranded} row(s) into it from {default}")
+
+def maintain_partitions():
+    """Runs ensure_monthly_partitions for every partitioned table, one transaction each."""
+    if engine.dialect.name != "postgresql":
+        return
+    for table in MONTHLY_PARTITIONED_TABLES:
+        with engine.begin() as conn:
+            ensure_monthly_partitions(conn, table)
+
+def init_db():
+    """Creates tables and applies SCHEMA_UPGRADES. Models must be imported first."""
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for statement in SCHEMA_UPGRADES:
+                conn.execute(text(statement))
+    maintain_partitions()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import engine, init_db, maintain_partitions
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff while the database or model is not available yet
+WARM_UP_MAX_BACKOFF = 30.0
+
+class ServiceState:
+    """
+    Readiness of this process, reported separately from liveness.
+
+    The process is live as soon as it serves HTTP; it is ready once the
+    schema is in place and a model is loaded. Warm-up runs in a background
+    thread so liveness probes answer while it is still in progress.
+    """
+
+    def __init__(self):
+        self.checks = {"database": False, "model": False}
+        self.errors = {}
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.values())
+
+    def _mark(self, name: str, ok: bool, error: Exception = None):
+        self.checks[name] = ok
+        if error is None:
+            self.errors.pop(name, None)
+        else:
+            self.errors[name] = str(error)
+
+    def start_warm_up(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def warm_up(self):
+        """Creates the schema and loads the model (retrying), then starts background work."""
+        # Imported here to keep app.core free of service-layer imports
+        from app.services.profiler import profiling_service
+
+        backoff = 1.0
+        while not self.ready:
+            if not self.checks["database"]:
+                try:
+                    init_db()
+                    self.backfill_counters()
+                    self._mark("database", True)
+                except Exception as e:
+                    logger.error(f"Could not create database tables: {e}")
+                    self._mark("database", False, e)
+            if not self.checks["model"]:
+                try:
+                    # Returns at once when the model was inherited from a preloading parent
+                    profiling_service.load_model()
+                    self._mark("model", True)
+                except Exception as e:
+                    logger.error(f"Failed to load model: {e}")
+                    self._mark("model", False, e)
+            if not self.ready:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, WARM_UP_MAX_BACKOFF)
+
+        logger.info(f"Service ready (model {profiling_service.model_version}).")
+        self.start_background_work()
+
+    def backfill_counters(self):
+        """Fills profile_counters the first time it exists next to existing profiles."""
+        from app.core.database import SessionLocal
+        from app.repositories.profile_repository import profile_repository
+        with SessionLocal() as db:
+            if profile_repository.rebuild_counters(db, only_if_empty=True):
+                logger.info("profile_counters rebuilt from student_profiles.")
+
+    def start_background_work(self):
+        from app.services.profiler import profiling_service
+        profiling_service.start_model_watch()
+        threading.Thread(target=self.maintain_partitions_forever, name="partition-maintenance", daemon=True).start()
+        if settings.RUN_CONSUMER:
+            from app.services.consumer import start_consumer
+            logger.info("Starting RabbitMQ consumer thread...")
+            threading.Thread(target=start_consumer, name="features-consumer", daemon=True).start()
+        if settings.RUN_OUTBOX_RELAY:
+            # Relay committed profile_updated events from the outbox to RabbitMQ
+            from app.services.outbox_relay import outbox_relay
+            outbox_relay.start()
+
+    def maintain_partitions_forever(self):
+        """Keeps the upcoming history partitions created for as long as the process runs."""
+        while True:
+            time.sleep(settings.PARTITION_MAINTENANCE_INTERVAL)
+            try:
+                maintain_partitions()
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+
+    def readiness(self) -> dict:
+        checks, errors = dict(self.checks), dict(self.errors)
+        if self.ready:
+            # Warm-up is over, but the database can still go away afterwards
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception as e:
+                checks["database"] = False
+                errors["database"] = str(e)
+        return {"ready": all(checks.values()), "checks": checks, "errors": errors}
+
+service_state = ServiceState()
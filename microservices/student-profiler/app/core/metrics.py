@@ -0,0 +1,60 @@
+import threading
+from collections import defaultdict, deque
+import numpy as np
+
+class Metrics:
+    """
+    In-process counters, gauges and latency summaries exposed on GET /metrics.
+
+    Timings keep the most recent `window` observations per name, so
+    percentiles reflect current behaviour rather than the whole uptime.
+    """
+
+    def __init__(self, window: int = 2048):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(lambda: deque(maxlen=self._window))
+        self._timing_counts = defaultdict(int)
+        self._gauges = {}
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self._timings[name].append(seconds)
+            self._timing_counts[name] += 1
+
+    def gauge(self, name: str, fn):
+        """Registers a callable sampled each time metrics are read."""
+        self._gauges[name] = fn
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: (list(values), self._timing_counts[name]) for name, values in self._timings.items()}
+
+        summaries = {}
+        for name, (values, count) in timings.items():
+            if not values:
+                continue
+            p50, p99 = np.percentile(values, [50, 99]) * 1000
+            summaries[name] = {
+                "count": count,
+                "p50_ms": round(float(p50), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(max(values) * 1000, 3)
+            }
+
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+
+        return {"counters": counters, "gauges": gauges, "timings": summaries}
+
+metrics = Metrics()
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.api import endpoints
-from app.core.database import engine, Base
+from app.core.lifecycle import service_state
 import logging
 import uvicorn
 import py_eureka_client.eureka_client as eureka_client
@@ -12,12 +13,8 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-# Create Database Tables
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    logging.error(f"Could not create database tables: {e}")
-
+# Importing this module has no side effects: schema creation, model loading
+# and background threads all happen at startup (see app.core.lifecycle)
 app = FastAPI(
     title="Student Profiler",
     version="1.0.0"
@@ -38,27 +35,28 @@ async def init_eureka():
 
 @app.on_event("startup")
 async def startup_event():
+    # Runs in every worker, after the fork: threads and connections are per process
+    service_state.start_warm_up()
     logging.info("Initializing Eureka client...")
     await init_eureka()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    from app.services.publisher import profile_publisher
+    profile_publisher.stop()
+
 @app.get("/health")
 def health_check():
+    """Liveness: the process is up and serving."""
     return {"status": "ok", "service": "StudentProfiler"}
 
-app.include_router(endpoints.router)
-
-import threading
-from app.services.consumer import start_consumer
+@app.get("/ready")
+def readiness_check():
+    """Readiness: schema in place, model loaded and database reachable."""
+    readiness = service_state.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
 
-# ... (rest of the imports)
-
-# Start RabbitMQ consumer in a background thread
-def run_consumer():
-    logging.info("Starting RabbitMQ consumer thread...")
-    start_consumer()
-
-consumer_thread = threading.Thread(target=run_consumer, daemon=True)
-consumer_thread.start()
+app.include_router(endpoints.router)
 
 # For debugging locally via python app/main.py
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,3 +12,60 @@ class StudentProfile(Base):
     progress_rate = Column(Float, default=0.0)
     risk_level = Column(String, default="Low")
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Hash of the features the profile was computed from (see ProfilingService.fingerprint)
+    feature_fingerprint = Column(String(32), nullable=True)
+    # Model version that assigned cluster_id (see ModelStore)
+    model_version = Column(String(64), nullable=True)
+
+class ProfileOutbox(Base):
+    """profile_updated events written in the same transaction as the profile upsert."""
+    __tablename__ = "profile_outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    student_id = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # The relay only ever scans unsent rows in id order
+        Index("ix_profile_outbox_unsent", "id", postgresql_where=sent_at.is_(None), sqlite_where=sent_at.is_(None)),
+    )
+
+class ProfileHistory(Base):
+    """
+    Append-only log of every profile write, partitioned by month on PostgreSQL.
+
+    previous_cluster_id is the cluster the student had before the write, so
+    transitions are a plain range scan with no window functions.
+    """
+    __tablename__ = "student_profile_history"
+
+    # The partition key has to be part of the primary key
+    student_id = Column(String, primary_key=True)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    cluster_id = Column(Integer, nullable=False)
+    previous_cluster_id = Column(Integer, nullable=True)
+    profil_type = Column(String, nullable=True)
+    risk_level = Column(String, nullable=True)
+    mean_score = Column(Float, nullable=True)
+    progress_rate = Column(Float, nullable=True)
+    model_version = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        # Per-student windows use the primary key; cohort-wide windows scan by
+        # time, and BRIN stays tiny on append-only, time-ordered data
+        Index("ix_profile_history_recorded_at", "recorded_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+
+class ProfileCounter(Base):
+    """
+    Number of students per (cluster, risk level), kept up to date by the
+    profile upsert so distribution queries read a handful of rows.
+    """
+    __tablename__ = "profile_counters"
+
+    cluster_id = Column(Integer, primary_key=True)
+    risk_level = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
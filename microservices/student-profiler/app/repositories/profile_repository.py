@@ -0,0 +1,213 @@
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert, select, delete, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.models.domain import StudentProfile, ProfileOutbox, ProfileHistory, ProfileCounter
+
+# Keeps each statement well below driver / server parameter limits
+UPSERT_CHUNK_SIZE = 5000
+
+UPDATABLE_COLUMNS = ("cluster_id", "profil_type", "mean_score", "progress_rate", "risk_level", "feature_fingerprint", "model_version")
+
+class ProfileRepository:
+    """Bulk persistence for student_profiles."""
+
+    def _insert(self, db: Session, model=StudentProfile):
+        # SQLite supports the same ON CONFLICT / RETURNING syntax (used by benchmarks)
+        dialect = db.get_bind().dialect.name
+        return (sqlite.insert if dialect == "sqlite" else postgresql.insert)(model)
+
+    def _write_time(self, db: Session):
+        # On PostgreSQL, the time of the write rather than of the transaction
+        # start: a writer that waited for another's row locks is recorded after it.
+        # On SQLite, milliseconds rather than CURRENT_TIMESTAMP's whole seconds,
+        # so two writes of a student rarely share a history key
+        if db.get_bind().dialect.name == "postgresql":
+            return func.clock_timestamp()
+        return func.strftime("%Y-%m-%d %H:%M:%f", "now")
+
+    def get_profiles(self, db: Session, student_ids: List[str], for_update: bool = False) -> dict:
+        """
+        Current profile rows for the given students, keyed by student_id.
+
+        Writers pass for_update=True: the rows stay locked until the caller's
+        transaction ends, so the values they compute history and counter
+        deltas from cannot be changed by a concurrent writer meanwhile.
+        """
+        if for_update:
+            # Same lock order in every writer, so they cannot deadlock
+            student_ids = sorted(student_ids)
+        found = {}
+        for start in range(0, len(student_ids), UPSERT_CHUNK_SIZE):
+            stmt = select(
+                StudentProfile.student_id,
+                StudentProfile.cluster_id,
+                StudentProfile.profil_type,
+                StudentProfile.mean_score,
+                StudentProfile.progress_rate,
+                StudentProfile.risk_level,
+                StudentProfile.timestamp,
+                StudentProfile.feature_fingerprint,
+                StudentProfile.model_version
+            ).where(StudentProfile.student_id.in_(student_ids[start:start + UPSERT_CHUNK_SIZE]))
+            if for_update:
+                stmt = stmt.order_by(StudentProfile.student_id).with_for_update()
+            found.update((row.student_id, row) for row in db.execute(stmt).all())
+        return found
+
+    def upsert_profiles(self, db: Session, rows: List[dict]) -> list:
+        """
+        Writes many profiles with INSERT ... ON CONFLICT (student_id) DO UPDATE
+        ... RETURNING. Does not commit: callers own the transaction so related
+        writes can join it.
+
+        Rows are passed as executemany parameters rather than inlined with
+        .values(), so the statement compiles once and is cached; SQLAlchemy's
+        insertmanyvalues still sends them as multi-row INSERTs.
+        """
+        stmt = self._insert(db)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StudentProfile.student_id],
+            set_={**{c: stmt.excluded[c] for c in UPDATABLE_COLUMNS}, "timestamp": self._write_time(db)}
+        )
+        return self._write_profiles(db, stmt, rows)
+
+    def insert_new_profiles(self, db: Session, rows: List[dict]) -> list:
+        """
+        Inserts profiles of students that had none, skipping (and not
+        returning) those a concurrent writer inserted first. Does not commit.
+        """
+        stmt = self._insert(db).values(timestamp=self._write_time(db))
+        return self._write_profiles(db, stmt.on_conflict_do_nothing(index_elements=[StudentProfile.student_id]), rows)
+
+    def _write_profiles(self, db: Session, stmt, rows: List[dict]) -> list:
+        # A student listed twice keeps its last values; sorted like the row locks
+        rows = sorted({row["student_id"]: row for row in rows}.values(), key=lambda row: row["student_id"])
+        if not rows:
+            return []
+        stmt = stmt.returning(
+            StudentProfile.student_id,
+            StudentProfile.cluster_id,
+            StudentProfile.profil_type,
+            StudentProfile.mean_score,
+            StudentProfile.progress_rate,
+            StudentProfile.risk_level,
+            StudentProfile.timestamp,
+            StudentProfile.model_version
+        )
+        conn = db.connection()
+        saved = []
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            saved.extend(conn.execute(stmt, rows[start:start + UPSERT_CHUNK_SIZE]).all())
+        return saved
+
+    def add_outbox_events(self, db: Session, events: List[dict]):
+        """Queues profile_updated events in the outbox, inside the caller's transaction."""
+        if events:
+            db.execute(insert(ProfileOutbox), [{"student_id": e["studentId"], "payload": e} for e in events])
+
+    def add_history(self, db: Session, saved: list, previous: dict):
+        """
+        Appends one history row per written profile, inside the caller's
+        transaction. `previous` maps student_id to the row before the write.
+        """
+        rows = [{
+            "student_id": row.student_id,
+            "recorded_at": row.timestamp,
+            "cluster_id": row.cluster_id,
+            "previous_cluster_id": previous[row.student_id].cluster_id if row.student_id in previous else None,
+            "profil_type": row.profil_type,
+            "risk_level": row.risk_level,
+            "mean_score": row.mean_score,
+            "progress_rate": row.progress_rate,
+            "model_version": row.model_version,
+        } for row in saved]
+        if rows:
+            # No ON CONFLICT: a key collision would drop a real write, so it
+            # fails the transaction instead (the consumer retries it)
+            db.connection().execute(insert(ProfileHistory), rows)
+
+    def add_counter_deltas(self, db: Session, saved: list, previous: dict):
+        """
+        Moves written profiles between (cluster, risk) counters, inside the
+        caller's transaction. `previous` maps student_id to the row before the
+        write, as for add_history.
+        """
+        deltas = Counter()
+        for row in saved:
+            deltas[(row.cluster_id, row.risk_level or "")] += 1
+            old = previous.get(row.student_id)
+            if old is not None:
+                deltas[(old.cluster_id, old.risk_level or "")] -= 1
+        # Fixed key order so concurrent writers lock counter rows in the same order
+        rows = [
+            {"cluster_id": cluster_id, "risk_level": risk_level, "count": delta}
+            for (cluster_id, risk_level), delta in sorted(deltas.items())
+            if delta
+        ]
+        if rows:
+            stmt = self._insert(db, ProfileCounter)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ProfileCounter.cluster_id, ProfileCounter.risk_level],
+                set_={"count": ProfileCounter.count + stmt.excluded["count"]}
+            )
+            db.connection().execute(stmt, rows)
+
+    def get_counters(self, db: Session) -> list:
+        return db.execute(
+            select(ProfileCounter.cluster_id, ProfileCounter.risk_level, ProfileCounter.count)
+            .where(ProfileCounter.count > 0)
+            .order_by(ProfileCounter.cluster_id, ProfileCounter.risk_level)
+        ).all()
+
+    def rebuild_counters(self, db: Session, only_if_empty: bool = False) -> bool:
+        """
+        Recomputes profile_counters from student_profiles (initial backfill or
+        repair). Blocks profile writers for the duration on PostgreSQL.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE profile_counters IN EXCLUSIVE MODE"))
+        if only_if_empty and db.execute(select(ProfileCounter.cluster_id).limit(1)).first() is not None:
+            db.rollback()
+            return False
+        db.execute(delete(ProfileCounter))
+        db.execute(insert(ProfileCounter).from_select(
+            ["cluster_id", "risk_level", "count"],
+            select(StudentProfile.cluster_id, func.coalesce(StudentProfile.risk_level, ""), func.count())
+            .group_by(StudentProfile.cluster_id, func.coalesce(StudentProfile.risk_level, ""))
+        ))
+        db.commit()
+        return True
+
+    def _transitions_query(self, since: datetime, until: datetime):
+        return (
+            select(ProfileHistory)
+            .where(ProfileHistory.recorded_at >= since, ProfileHistory.recorded_at < until)
+            .where(ProfileHistory.cluster_id.is_distinct_from(ProfileHistory.previous_cluster_id))
+        )
+
+    def get_transitions(self, db: Session, student_id: str, since: datetime, until: datetime) -> list:
+        """Cluster changes of one student in [since, until), oldest first."""
+        return db.execute(
+            self._transitions_query(since, until)
+            .where(ProfileHistory.student_id == student_id)
+            .order_by(ProfileHistory.recorded_at)
+        ).scalars().all()
+
+    def count_transitions(self, db: Session, since: datetime, until: datetime, student_ids: Optional[List[str]] = None) -> list:
+        """(previous_cluster_id, cluster_id, students, transitions) for a cohort, or everyone."""
+        history = self._transitions_query(since, until).subquery()
+        stmt = select(
+            history.c.previous_cluster_id,
+            history.c.cluster_id,
+            func.count(history.c.student_id.distinct()).label("students"),
+            func.count().label("transitions")
+        ).group_by(history.c.previous_cluster_id, history.c.cluster_id)
+        if student_ids is not None:
+            stmt = stmt.where(history.c.student_id.in_(student_ids))
+        return db.execute(stmt.order_by(history.c.previous_cluster_id, history.c.cluster_id)).all()
+
+profile_repository = ProfileRepository()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class StudentFeatures(BaseModel):
     student_id: int
@@ -22,3 +22,36 @@ class PredictionResult(BaseModel):
 
     class Config:
         from_attributes = True
+
+class BatchStudentFeatures(BaseModel):
+    students: List[StudentFeatures]
+
+class BatchPredictionResult(BaseModel):
+    count: int
+    results: List[PredictionResult]
+
+class ProfileBatchGetRequest(BaseModel):
+    student_ids: List[str]
+
+class ProfileTransition(BaseModel):
+    student_id: str
+    recorded_at: datetime
+    previous_cluster_id: Optional[int] = None
+    cluster_id: int
+    profil_type: Optional[str] = None
+    risk_level: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class CohortTransitionsQuery(BaseModel):
+    # Omit to aggregate over every student
+    student_ids: Optional[List[str]] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+class TransitionCount(BaseModel):
+    previous_cluster_id: Optional[int] = None
+    cluster_id: int
+    students: int
+    transitions: int
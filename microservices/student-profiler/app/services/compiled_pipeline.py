@@ -0,0 +1,72 @@
+import numpy as np
+from typing import List
+
+
+class CompiledPipeline:
+    """
+    The fitted imputer -> scaler -> PCA -> KMeans pipeline reduced to plain arrays.
+
+    Scaler and PCA are both affine, so they collapse into a single projection
+    `y = x @ weights + offset`. Nearest-centroid search only needs
+    `-2 y.c + |c|^2` per centroid, which is affine in x as well, so a whole
+    prediction is one fill, one matmul and one argmin.
+    """
+
+    def __init__(self, feature_cols: List[str], fill_values, missing_value, weights, offset, centroids):
+        self.feature_cols = list(feature_cols)
+        self.fill_values = np.asarray(fill_values, dtype=np.float64)
+        self.missing_value = missing_value
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.set_centroids(centroids)
+
+    @classmethod
+    def from_sklearn(cls, pipeline: dict) -> "CompiledPipeline":
+        imputer, scaler = pipeline['imputer'], pipeline['scaler']
+        pca, kmeans = pipeline['pca'], pipeline['kmeans']
+        n_features = len(pipeline['feature_cols'])
+
+        mean = scaler.mean_ if scaler.mean_ is not None and scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None and scaler.with_std else np.ones(n_features)
+
+        # y = ((x - mean) / scale - pca.mean_) @ components.T
+        components = pca.components_
+        if pca.whiten:
+            components = components / np.sqrt(pca.explained_variance_)[:, np.newaxis]
+        weights = (components / scale).T
+        offset = -(mean / scale + pca.mean_) @ components.T
+
+        return cls(
+            feature_cols=pipeline['feature_cols'],
+            fill_values=imputer.statistics_,
+            missing_value=imputer.missing_values,
+            weights=weights,
+            offset=offset,
+            centroids=kmeans.cluster_centers_,
+        )
+
+    def set_centroids(self, centroids):
+        """Replaces the cluster centroids and re-fuses the scoring matrix."""
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        # argmin_k |y - c_k|^2 == argmin_k (x @ score_weights + score_offset)_k
+        self.score_weights = -2.0 * self.weights @ self.centroids.T
+        self.score_offset = -2.0 * self.offset @ self.centroids.T + np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    def impute(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if isinstance(self.missing_value, float) and np.isnan(self.missing_value):
+            missing = np.isnan(X)
+        else:
+            missing = X == self.missing_value
+        if missing.any():
+            X = np.where(missing, self.fill_values, X)
+        return X
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Projects feature rows (columns in feature_cols order) into PCA space."""
+        return self.impute(X) @ self.weights + self.offset
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Returns the nearest-centroid cluster id for each feature row."""
+        scores = self.impute(X) @ self.score_weights + self.score_offset
+        return np.argmin(scores, axis=1)
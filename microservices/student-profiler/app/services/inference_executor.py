@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class InferenceOverloaded(Exception):
+    """Raised when a prediction is refused or shed because the executor is saturated."""
+
+class InferenceExecutor:
+    """
+    Dedicated worker threads for prediction requests, with admission control.
+
+    At most `workers` predictions run at once and at most `max_queue` wait
+    behind them; further submissions are refused immediately instead of
+    piling up on the shared request thread pool. A prediction that waited
+    longer than `queue_timeout` is shed before it starts, since its caller
+    has most likely given up already.
+    """
+
+    def __init__(self, workers: int = settings.INFERENCE_WORKERS, max_queue: int = settings.INFERENCE_MAX_QUEUE,
+                 queue_timeout: float = settings.INFERENCE_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        # Submitted and not finished yet (queued + running)
+        self._pending = 0
+        metrics.gauge("inference.queue_depth", self.queue_depth)
+
+    def queue_depth(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                metrics.incr("inference.rejected")
+                raise InferenceOverloaded(f"Inference queue full ({self.max_queue} waiting)")
+            self._pending += 1
+        try:
+            future = self._pool.submit(self._run, time.monotonic(), fn, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Frees the slot however the future ends, including a cancelled
+        # queued future whose _run never executes
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, submitted_at: float, fn, args, kwargs):
+        started = time.monotonic()
+        metrics.observe("inference.queue_wait", started - submitted_at)
+        if started - submitted_at > self.queue_timeout:
+            metrics.incr("inference.shed")
+            raise InferenceOverloaded(f"Waited {started - submitted_at:.2f}s for an inference worker")
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe("inference.compute", time.monotonic() - started)
+
+    def _release(self, future: Future = None):
+        with self._lock:
+            self._pending -= 1
+
+inference_executor = InferenceExecutor()
@@ -0,0 +1,112 @@
+import hashlib
+import joblib
+import os
+from typing import List, Optional, Tuple
+from app.core.config import settings
+
+# Construct path relative to the app root
+# Assuming MODEL_FILENAME is just the filename and it's in the root of the service
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), settings.MODEL_FILENAME)
+
+MODEL_SUFFIX = ".joblib"
+
+class ModelStore:
+    """
+    Locates model versions on disk.
+
+    With MODEL_DIR set, every `<version>.joblib` in it is a version and an
+    optional CURRENT file names the one to serve (default: the last version
+    in sort order). Without MODEL_DIR, the bundled MODEL_FILENAME is the only
+    version, named after a hash of its content.
+    """
+
+    def __init__(self, model_dir: str = settings.MODEL_DIR, fallback_path: str = MODEL_PATH):
+        self.model_dir = model_dir
+        self.fallback_path = fallback_path
+
+    def versions(self) -> List[str]:
+        if not self.model_dir:
+            return [self._file_version(self.fallback_path)] if os.path.exists(self.fallback_path) else []
+        if not os.path.isdir(self.model_dir):
+            return []
+        return sorted(name[:-len(MODEL_SUFFIX)] for name in os.listdir(self.model_dir) if name.endswith(MODEL_SUFFIX))
+
+    def current_version(self) -> Optional[str]:
+        if self.model_dir:
+            pointer = os.path.join(self.model_dir, "CURRENT")
+            if os.path.exists(pointer):
+                with open(pointer) as f:
+                    return f.read().strip() or None
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def resolve(self, version: Optional[str] = None) -> Tuple[str, str]:
+        """Returns (version, path) of the requested or current version."""
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No model found in {self.model_dir or self.fallback_path}")
+        if not self.model_dir:
+            if version != self._file_version(self.fallback_path):
+                raise FileNotFoundError(f"Unknown model version {version}")
+            return version, self.fallback_path
+
+        path = os.path.join(self.model_dir, f"{version}{MODEL_SUFFIX}")
+        # Versions are plain file names, never paths
+        if os.path.basename(version) != version or not os.path.exists(path):
+            raise FileNotFoundError(f"Unknown model version {version}")
+        return version, path
+
+    def save(self, version: str, pipeline, make_current: bool = True) -> str:
+        """Writes a new version (and optionally points CURRENT at it) atomically."""
+        if not self.model_dir:
+            raise RuntimeError("MODEL_DIR is not set; versions cannot be saved")
+        path = os.path.join(self.model_dir, f"{version}{MODEL_SUFFIX}")
+        joblib.dump(pipeline, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        if make_current:
+            self._write_pointer(version)
+        return path
+
+    def set_current(self, version: str):
+        """Points CURRENT at an existing version (a no-op without MODEL_DIR, which has one version)."""
+        version, _ = self.resolve(version)
+        if self.model_dir:
+            self._write_pointer(version)
+
+    def stamp(self) -> Optional[int]:
+        """
+        Cheap change marker for current_version(): the mtime of CURRENT, else
+        of the model directory (new versions) or of the bundled model file.
+        """
+        if self.model_dir:
+            pointer = os.path.join(self.model_dir, "CURRENT")
+            path = pointer if os.path.exists(pointer) else self.model_dir
+        else:
+            path = self.fallback_path
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _write_pointer(self, version: str):
+        pointer = os.path.join(self.model_dir, "CURRENT")
+        with open(f"{pointer}.tmp", "w") as f:
+            f.write(version)
+        os.replace(f"{pointer}.tmp", pointer)
+
+    def prune(self, prefix: str, keep: int):
+        """Deletes all but the `keep` newest versions starting with prefix (never CURRENT)."""
+        current = self.current_version()
+        matching = [v for v in self.versions() if v.startswith(prefix) and v != current]
+        for version in matching[:max(len(matching) - keep, 0)]:
+            os.remove(os.path.join(self.model_dir, f"{version}{MODEL_SUFFIX}"))
+
+    @staticmethod
+    def _file_version(path: str) -> str:
+        digest = hashlib.blake2b(digest_size=6)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+model_store = ModelStore()
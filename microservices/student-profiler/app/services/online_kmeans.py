@@ -0,0 +1,143 @@
+import copy
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.model_store import model_store
+
+logger = logging.getLogger(__name__)
+
+class OnlineCentroidUpdater:
+    """
+    Mini-batch KMeans updates of the serving model's centroids.
+
+    Each batch prediction is folded in: every centroid moves toward the mean
+    (in PCA space) of the students just assigned to it, by
+    1 - (1 - learning_rate)^n for n assigned students, i.e. as if each
+    student had pulled it by learning_rate in turn. The updated centroids
+    are swapped in as a new LoadedModel, so predictions never see a
+    half-updated model.
+
+    Drift is measured against the centroids the model was loaded with.
+    Snapshots are saved to the model store as `<lineage>-online-<time>`
+    versions and made CURRENT, so restarts and other processes (via
+    /admin/model/reload) pick the learned centroids up.
+    """
+
+    def __init__(self, store=model_store, enabled: bool = settings.ONLINE_KMEANS_ENABLED,
+                 learning_rate: float = settings.ONLINE_KMEANS_LEARNING_RATE,
+                 snapshot_interval: float = settings.ONLINE_KMEANS_SNAPSHOT_INTERVAL,
+                 snapshot_keep: int = settings.ONLINE_KMEANS_SNAPSHOT_KEEP):
+        self.store = store
+        self.enabled = enabled
+        self.learning_rate = learning_rate
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_keep = snapshot_keep
+        self._lock = threading.Lock()
+        self._lineage = None
+        self._base_centroids = None
+        self._centroids = None
+        self._updates_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._last_shift = 0.0
+        self._batch_inertia = None
+        metrics.gauge("online_kmeans.max_drift", lambda: float(self.drift().max()) if self._lineage else None)
+        metrics.gauge("online_kmeans.last_shift", lambda: self._last_shift)
+        metrics.gauge("online_kmeans.batch_inertia", lambda: self._batch_inertia)
+
+    def observe(self, service, model, X: np.ndarray, cluster_ids: np.ndarray):
+        """Folds a scored batch (rows in FEATURE_NAMES order) into the centroids."""
+        if not self.enabled or model is None or model.compiled is None or len(X) == 0:
+            return
+        with self._lock:
+            current = service.model
+            # A reload to another model meanwhile makes this batch irrelevant
+            if current is None or current.lineage != model.lineage or current.compiled is None:
+                return
+            if self._lineage != current.lineage:
+                self._reset(current)
+
+            compiled = current.compiled
+            Y = compiled.transform(X[:, current.compiled_columns])
+            cluster_ids = np.asarray(cluster_ids)
+            old = compiled.centroids
+            counts = np.bincount(cluster_ids, minlength=len(old))
+            sums = np.zeros_like(old)
+            np.add.at(sums, cluster_ids, Y)
+
+            centroids = old.copy()
+            present = counts > 0
+            rates = 1.0 - (1.0 - self.learning_rate) ** counts[present]
+            centroids[present] += rates[:, np.newaxis] * (sums[present] / counts[present, np.newaxis] - old[present])
+
+            if not service.swap_model(current, current.with_centroids(centroids)):
+                return
+            self._centroids = centroids
+            self._last_shift = float(np.linalg.norm(centroids - old, axis=1).max())
+            self._batch_inertia = float(np.mean(np.sum((Y - old[cluster_ids]) ** 2, axis=1)))
+            self._updates_since_snapshot += 1
+            metrics.incr("online_kmeans.updates")
+            metrics.incr("online_kmeans.points", len(Y))
+
+            if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                self._snapshot(service)
+
+    def drift(self) -> np.ndarray:
+        """Distance of each centroid from where it was when the model was loaded."""
+        if self._lineage is None:
+            return np.zeros(0)
+        return np.linalg.norm(self._centroids - self._base_centroids, axis=1)
+
+    def stats(self) -> dict:
+        drift = self.drift()
+        return {
+            "enabled": self.enabled,
+            "learning_rate": self.learning_rate,
+            "lineage": self._lineage,
+            "updates_since_snapshot": self._updates_since_snapshot,
+            "last_shift": self._last_shift,
+            "batch_inertia": self._batch_inertia,
+            "drift": drift.round(6).tolist(),
+        }
+
+    def _reset(self, model):
+        self._lineage = model.lineage
+        self._base_centroids = model.compiled.centroids.copy()
+        self._centroids = self._base_centroids
+        self._updates_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+
+    def _snapshot(self, service):
+        self._last_snapshot = time.monotonic()
+        if not self._updates_since_snapshot:
+            return
+        if not self.store.model_dir:
+            logger.warning("Online KMeans snapshot skipped: MODEL_DIR is not set.")
+            return
+        current = service.model
+        if not isinstance(current.pipeline, dict):
+            return
+        try:
+            kmeans = copy.deepcopy(current.pipeline['kmeans'])
+            kmeans.cluster_centers_ = current.compiled.centroids.copy()
+            pipeline = {**current.pipeline, 'kmeans': kmeans}
+            # Snapshots of a loaded snapshot stay named after the original model
+            prefix = f"{current.lineage.split('-online-')[0]}-online-"
+            version = f"{prefix}{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}"
+            path = self.store.save(version, pipeline)
+            self.store.prune(prefix, self.snapshot_keep)
+        except Exception as e:
+            metrics.incr("online_kmeans.snapshot_errors")
+            logger.error(f"Online KMeans snapshot failed: {e}")
+            return
+
+        # Profiles written from now on are tagged with the snapshot version
+        service.swap_model(current, current.with_centroids(current.compiled.centroids, version, pipeline, path))
+        self._updates_since_snapshot = 0
+        metrics.incr("online_kmeans.snapshots")
+        logger.info(f"Online KMeans snapshot {version} saved to {path}")
+
+online_kmeans = OnlineCentroidUpdater()
@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as ConfirmTimeout
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete
+from sqlalchemy.sql import func
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.domain import ProfileOutbox
+from app.services.publisher import profile_publisher
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+# Idle wait between polls when nothing notified the relay
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '2'))
+# How long to wait for broker confirms before the batch is retried
+OUTBOX_CONFIRM_TIMEOUT = float(os.getenv('OUTBOX_CONFIRM_TIMEOUT', '30'))
+# Sent rows are purged after this many hours
+OUTBOX_RETENTION_HOURS = float(os.getenv('OUTBOX_RETENTION_HOURS', '24'))
+
+class OutboxRelay:
+    """
+    Streams unsent profile_outbox rows to the profile_updated queue.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED so several service instances
+    can relay concurrently, and are marked sent only after the broker has
+    confirmed the whole batch. A broker outage therefore delays events
+    instead of dropping them.
+    """
+
+    def __init__(self, session_factory=SessionLocal, publisher=profile_publisher, batch_size=OUTBOX_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_purge = 0.0
+        metrics.gauge("outbox.pending", self.pending_count)
+
+    def notify(self):
+        """Wakes the relay up right away (called after a profile commit)."""
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run, name="outbox-relay", daemon=True)
+            self._thread.start()
+
+    def pending_count(self) -> int:
+        with self.session_factory() as db:
+            return db.execute(select(func.count()).select_from(ProfileOutbox).where(ProfileOutbox.sent_at.is_(None))).scalar()
+
+    def relay_once(self) -> int:
+        """Publishes one batch of unsent events. Returns the number relayed."""
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(ProfileOutbox.id, ProfileOutbox.payload)
+                .where(ProfileOutbox.sent_at.is_(None))
+                .order_by(ProfileOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                return 0
+
+            confirmed = self.publisher.publish_batch([row.payload for row in rows])
+            try:
+                confirmed.result(timeout=OUTBOX_CONFIRM_TIMEOUT)
+            except ConfirmTimeout:
+                # Still queued: withdraw it, the rows are claimed again next round
+                if confirmed.cancel():
+                    raise
+                # Already being published: keep the rows locked until it settles,
+                # so they are not claimed and enqueued a second time
+                confirmed.result()
+
+            db.execute(
+                update(ProfileOutbox)
+                .where(ProfileOutbox.id.in_([row.id for row in rows]))
+                .values(sent_at=func.now())
+            )
+            db.commit()
+
+        metrics.incr("outbox.relayed", len(rows))
+        return len(rows)
+
+    def purge_sent(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=OUTBOX_RETENTION_HOURS)
+        with self.session_factory() as db:
+            db.execute(delete(ProfileOutbox).where(ProfileOutbox.sent_at < cutoff))
+            db.commit()
+
+    def run(self):
+        logger.info("Outbox relay started.")
+        while True:
+            try:
+                relayed = self.relay_once()
+                if time.monotonic() - self._last_purge > 3600:
+                    self.purge_sent()
+                    self._last_purge = time.monotonic()
+            except Exception as e:
+                metrics.incr("outbox.errors")
+                logger.error(f"Outbox relay error: {e}")
+                relayed = 0
+                time.sleep(OUTBOX_POLL_INTERVAL)
+
+            # Keep draining while full batches come back
+            if relayed < self.batch_size:
+                self._wakeup.wait(OUTBOX_POLL_INTERVAL)
+                self._wakeup.clear()
+
+outbox_relay = OutboxRelay()
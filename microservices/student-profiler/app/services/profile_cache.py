@@ -0,0 +1,76 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+from app.core.config import settings
+from app.core.metrics import metrics
+
+def profile_to_dict(row) -> dict:
+    """Public representation of a student_profiles row (GET /profile)."""
+    return {
+        "student_id": row.student_id,
+        "mean_score": float(row.mean_score or 0),
+        "progress_rate": float(row.progress_rate or 0),
+        "cluster_id": row.cluster_id,
+        "profile_name": row.profil_type,
+        "risk_level": row.risk_level,
+        "model_version": row.model_version
+    }
+
+def profile_etag(profile: dict) -> str:
+    digest = hashlib.blake2b(repr(sorted(profile.items())).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+class ProfileCache:
+    """
+    Process-local TTL + LRU cache of profile dicts, keyed by student_id.
+
+    Filled on read and written through by profile upserts in this process.
+    Other processes' writes become visible once the TTL expires.
+    """
+
+    def __init__(self, maxsize: int = settings.PROFILE_CACHE_SIZE, ttl: float = settings.PROFILE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # student_id -> (expires_at, profile)
+        self._entries = OrderedDict()
+        metrics.gauge("profile_cache.size", lambda: len(self._entries))
+
+    def get(self, student_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[student_id]
+                metrics.incr("profile_cache.misses")
+                return None
+            self._entries.move_to_end(student_id)
+        metrics.incr("profile_cache.hits")
+        return entry[1]
+
+    def put_many(self, profiles: Iterable[dict]):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for profile in profiles:
+                self._entries[profile["student_id"]] = (expires_at, profile)
+                self._entries.move_to_end(profile["student_id"])
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def put(self, profile: dict):
+        self.put_many([profile])
+
+    def invalidate(self, student_ids: List[str]):
+        with self._lock:
+            for student_id in student_ids:
+                self._entries.pop(student_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+profile_cache = ProfileCache()
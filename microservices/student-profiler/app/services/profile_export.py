@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import select
+from app.core.database import engine
+from app.models.domain import StudentProfile
+
+# Rows fetched per round trip from the server-side cursor (and per output chunk)
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', '5000'))
+
+EXPORT_COLUMNS = [
+    StudentProfile.student_id,
+    StudentProfile.cluster_id,
+    StudentProfile.profil_type,
+    StudentProfile.risk_level,
+    StudentProfile.mean_score,
+    StudentProfile.progress_rate,
+    StudentProfile.model_version,
+    StudentProfile.timestamp,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def export_query(cluster_ids: Optional[List[int]] = None, risk_levels: Optional[List[str]] = None,
+                 updated_since: Optional[datetime] = None):
+    stmt = select(*EXPORT_COLUMNS).order_by(StudentProfile.student_id)
+    if cluster_ids:
+        stmt = stmt.where(StudentProfile.cluster_id.in_(cluster_ids))
+    if risk_levels:
+        stmt = stmt.where(StudentProfile.risk_level.in_(risk_levels))
+    if updated_since is not None:
+        stmt = stmt.where(StudentProfile.timestamp >= updated_since)
+    return stmt
+
+def iter_chunks(stmt, fetch_size: int = EXPORT_FETCH_SIZE, bind=None) -> Iterator[list]:
+    """
+    Yields lists of at most fetch_size rows from a server-side cursor, so
+    memory does not grow with the result. Uses its own connection because
+    the response is streamed after the request's session is gone.
+    """
+    with (bind or engine).connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=fetch_size).execute(stmt)
+        for rows in result.partitions():
+            yield rows
+
+def _plain(row) -> dict:
+    values = row._asdict()
+    if values["timestamp"] is not None:
+        values["timestamp"] = values["timestamp"].isoformat()
+    return values
+
+def encode_ndjson(chunks) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(json.dumps(_plain(row), ensure_ascii=False) + "\n" for row in rows).encode()
+
+def encode_csv(chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(_plain(row) for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def encode_arrow(chunks) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema, one record batch per chunk, then end-of-stream."""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("student_id", pa.string()),
+        ("cluster_id", pa.int32()),
+        ("profil_type", pa.string()),
+        ("risk_level", pa.string()),
+        ("mean_score", pa.float64()),
+        ("progress_rate", pa.float64()),
+        ("model_version", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+    ])
+    buffer = io.BytesIO()
+    writer = pa.ipc.new_stream(buffer, schema)
+    for rows in chunks:
+        columns = list(zip(*rows))
+        writer.write_batch(pa.record_batch([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.close()
+    yield buffer.getvalue()
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv, "arrow": encode_arrow}
@@ -1,141 +1,345 @@
+import copy
+import hashlib
 import joblib
+import numpy as np
 import pandas as pd
 import logging
-import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from app.models.domain import StudentProfile
+from app.repositories.profile_repository import profile_repository
 from app.schemas.pydantic_models import StudentFeatures, PredictionResult
+from app.services.compiled_pipeline import CompiledPipeline
+from app.services.model_store import model_store
+from app.services.online_kmeans import online_kmeans
+from app.services.publisher import ProfilePublisher
+from app.services.outbox_relay import outbox_relay
+from app.services.profile_cache import profile_cache, profile_to_dict
 from app.core.config import settings
+from app.core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# Construct path relative to the app root
-# Assuming MODEL_FILENAME is just the filename and it's in the root of the service
-MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), settings.MODEL_FILENAME)
+# All features a StudentFeatures payload carries, in matrix column order
+FEATURE_NAMES = [
+    "total_clicks",
+    "assessment_submissions_count",
+    "mean_score",
+    "active_days",
+    "study_duration",
+    "progress_rate",
+]
+
+# Cluster to Risk Map: 0: At-Risk (High), 1: Regular (Low), 2: Procrastinator (Medium)
+RISK_MAP = {0: "High", 1: "Low", 2: "Medium"}
+
+class LoadedModel:
+    """
+    One model version, fully loaded and compiled. Never mutated after
+    construction: a reload builds a new instance and swaps the reference.
+    """
+
+    def __init__(self, version: str, pipeline, source: str):
+        self.version = version
+        self.pipeline = pipeline
+        self.source = source
+        # Version this model was loaded as; kept by online centroid updates
+        self.lineage = version
+        self.loaded_at = datetime.now(timezone.utc)
+        self.compiled = None
+        self.compiled_columns = None
+        self.compile_pipeline()
+
+    def compile_pipeline(self):
+        """Reduces a dict pipeline to NumPy arrays for the fast prediction path."""
+        if not isinstance(self.pipeline, dict):
+            return
+        try:
+            self.compiled = CompiledPipeline.from_sklearn(self.pipeline)
+            self.compiled_columns = [FEATURE_NAMES.index(c) for c in self.compiled.feature_cols]
+            logger.info(f"Model {self.version} compiled to NumPy fast path.")
+        except Exception as e:
+            logger.warning(f"Could not compile model {self.version}, using sklearn path: {e}")
+
+    def with_centroids(self, centroids, version: Optional[str] = None, pipeline=None, source: Optional[str] = None) -> "LoadedModel":
+        """A copy of this model with other cluster centroids (compiled fast path only)."""
+        model = copy.copy(self)
+        compiled = self.compiled
+        model.compiled = CompiledPipeline(
+            compiled.feature_cols, compiled.fill_values, compiled.missing_value,
+            compiled.weights, compiled.offset, centroids
+        )
+        model.version = version or self.version
+        model.pipeline = pipeline if pipeline is not None else self.pipeline
+        model.source = source or self.source
+        return model
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "lineage": self.lineage,
+            "source": self.source,
+            "loaded_at": self.loaded_at.isoformat(),
+            "compiled": self.compiled is not None,
+        }
 
 class ProfilingService:
-    def __init__(self):
-        self.pipeline = None
-        self.load_model()
-        
+    def __init__(self, store=model_store):
+        self.store = store
+        self.model: Optional[LoadedModel] = None
+        # Serializes reloads only; predictions read self.model without locking
+        self._reload_lock = threading.Lock()
+        # store.stamp() as of the last refresh_model()
+        self._store_stamp = None
+        self._watch_thread = None
+        # The model is loaded by the process entry point (see app.core.lifecycle),
+        # not at import, so forked workers can inherit an already loaded model
+
         self.cluster_profile_map = {
             0: "En difficulté (At-Risk)",
             1: "Assidu (Regular)",
             2: "Procrastinateur (Procrastinator)",
         }
 
-    def load_model(self):
-        """Loads the pre-trained ML pipeline."""
-        if os.path.exists(MODEL_PATH):
+    @property
+    def pipeline(self):
+        return self.model.pipeline if self.model else None
+
+    @property
+    def compiled(self):
+        return self.model.compiled if self.model else None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.model.version if self.model else None
+
+    def load_model(self, version: Optional[str] = None) -> LoadedModel:
+        """
+        Loads and compiles a model version (default: the store's current one),
+        then swaps it in with a single reference assignment. Requests that
+        already picked up the previous model finish on it. Raises on failure,
+        leaving the serving model untouched.
+        """
+        with self._reload_lock:
+            version, path = self.store.resolve(version)
+            if self.model is not None and self.model.version == version:
+                return self.model
+            model = LoadedModel(version, joblib.load(path), path)
+            previous, self.model = self.model, model
+            metrics.incr("model.reloads")
+            logger.info(f"Model {version} loaded from {path}" + (f" (was {previous.version})" if previous else ""))
+            return model
+
+    def refresh_model(self) -> bool:
+        """
+        Loads the store's current version if it is not the serving one. Only
+        stats the store while it is unchanged since the previous call.
+        """
+        stamp = self.store.stamp()
+        if stamp == self._store_stamp:
+            return False
+        version = self.store.current_version()
+        reloaded = version is not None and version != self.model_version
+        if reloaded:
+            # On failure the stamp is not recorded, so the next call retries
+            self.load_model(version)
+        self._store_stamp = stamp
+        return reloaded
+
+    def start_model_watch(self, interval: float = settings.MODEL_WATCH_INTERVAL):
+        """
+        Follows the store's CURRENT version from a background thread, so a
+        reload (or online KMeans snapshot) made by any process reaches every
+        API worker and consumer process.
+        """
+        if interval <= 0 or (self._watch_thread is not None and self._watch_thread.is_alive()):
+            return
+        self._watch_thread = threading.Thread(target=self._watch_model, args=(interval,), name="model-watch", daemon=True)
+        self._watch_thread.start()
+
+    def _watch_model(self, interval: float):
+        while True:
+            time.sleep(interval)
             try:
-                self.pipeline = joblib.load(MODEL_PATH)
-                logger.info(f"Model loaded successfully from {MODEL_PATH}")
+                self.refresh_model()
             except Exception as e:
-                logger.error(f"Failed to load model from {MODEL_PATH}: {e}")
-                # Don't raise here, allow service to start even if model is broken
-                # raise e
-        else:
-            logger.warning(f"Model file not found at {MODEL_PATH}. Prediction service will fail.")
+                logger.error(f"Could not load the model store's current version: {e}")
+
+    def swap_model(self, expected: LoadedModel, model: LoadedModel) -> bool:
+        """Swaps in `model` unless the serving model is no longer `expected`."""
+        with self._reload_lock:
+            if self.model is not expected:
+                return False
+            self.model = model
+            return True
 
     def predict_profile(self, features: StudentFeatures, db: Session) -> PredictionResult:
-        if not self.pipeline:
-            # Fallback logic if model is not loaded (e.g. for testing/dev without model file)
+        logger.info(f"Processing prediction for student {features.student_id}")
+        return self.predict_profiles_batch([features], db)[0]
+
+    @staticmethod
+    def feature_matrix(features_list: List[StudentFeatures]) -> np.ndarray:
+        return np.array(
+            [[getattr(f, name) for name in FEATURE_NAMES] for f in features_list],
+            dtype=np.float64
+        )
+
+    def predict_clusters(self, X: np.ndarray, model: Optional[LoadedModel] = None) -> np.ndarray:
+        """
+        Runs the pipeline once on an N x len(FEATURE_NAMES) matrix and returns
+        the N cluster ids. Uses `model` if given, else the serving model.
+        """
+        model = model or self.model
+        if model is None:
             logger.warning("Model pipeline is not loaded. Using dummy prediction.")
-            cluster_id = 1 # Default to Regular
-        else:
-            data_dict = {
-                "total_clicks": [features.total_clicks],
-                "assessment_submissions_count": [features.assessment_submissions_count],
-                "mean_score": [features.mean_score],
-                "active_days": [features.active_days],
-                "study_duration": [features.study_duration],
-                "progress_rate": [features.progress_rate]
-            }
-            df = pd.DataFrame(data_dict)
+            return np.ones(len(X), dtype=np.int64)
 
-            try:
-                logger.info(f"Processing prediction for student {features.student_id}")
-
-                # Handle dict structure of model
-                if isinstance(self.pipeline, dict):
-                    # Manual pipeline execution based on the keys we found
-                    feature_cols = self.pipeline['feature_cols']
-                    X = df[feature_cols]
-                    
-                    # Transform while keeping feature names where possible
-                    X_imputed_arr = self.pipeline['imputer'].transform(X)
-                    X_imputed = pd.DataFrame(X_imputed_arr, columns=feature_cols)
-                    
-                    X_scaled_arr = self.pipeline['scaler'].transform(X_imputed)
-                    X_scaled = pd.DataFrame(X_scaled_arr, columns=feature_cols)
-                    
-                    X_pca = self.pipeline['pca'].transform(X_scaled)
-                    
-                    # K-means doesn't care about feature names but we pass them to avoid warnings
-                    # however PCA changes dimensionality, so X_pca doesn't have original names.
-                    # The warning usually comes from the first estimator that expects names
-                    # In this case, scaler and imputer were fitted with names.
-                    
-                    cluster_id = self.pipeline['kmeans'].predict(X_pca)[0]
-                else:
-                    cluster_id = self.pipeline.predict(df)[0]
-                
-                cluster_id = int(cluster_id)
-                logger.info(f"Predicted cluster: {cluster_id}")
+        if model.compiled is not None:
+            return model.compiled.predict(X[:, model.compiled_columns])
+        return self.predict_clusters_sklearn(X, model)
 
-            except Exception as e:
-                logger.error(f"Error during prediction pipeline: {e}")
-                raise e
+    def predict_clusters_sklearn(self, X: np.ndarray, model: Optional[LoadedModel] = None) -> np.ndarray:
+        """Reference path through the sklearn estimators themselves."""
+        pipeline = (model or self.model).pipeline
+        if isinstance(pipeline, dict):
+            feature_cols = pipeline['feature_cols']
+            X = X[:, [FEATURE_NAMES.index(c) for c in feature_cols]]
+            # Imputer and scaler were fitted with feature names
+            X_imputed = pipeline['imputer'].transform(pd.DataFrame(X, columns=feature_cols))
+            X_scaled = pipeline['scaler'].transform(pd.DataFrame(X_imputed, columns=feature_cols))
+            X_pca = pipeline['pca'].transform(X_scaled)
+            return pipeline['kmeans'].predict(X_pca).astype(np.int64)
+
+        return np.asarray(pipeline.predict(pd.DataFrame(X, columns=FEATURE_NAMES))).astype(np.int64)
+
+    @staticmethod
+    def fingerprint(X: np.ndarray) -> List[str]:
+        """Per-row hash of the feature values, used to detect unchanged features."""
+        X = np.ascontiguousarray(np.round(X, 6))
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in X]
+
+    def predict_profiles_batch(self, features_list: List[StudentFeatures], db: Session, force: bool = False) -> List[PredictionResult]:
+        """
+        Profiles a whole cohort: one pipeline run on the feature matrix and one
+        bulk upsert for all profiles, in a single transaction.
+
+        Students whose features match the fingerprint stored with their profile,
+        and whose profile came from the serving model version, are neither
+        re-predicted, re-written nor re-published (unless force). Results follow
+        the request order, one per distinct student.
+        """
+        if not features_list:
+            return []
+        # The whole batch runs on the model serving right now, even if a reload lands meanwhile
+        model = self.model
+        model_version = model.version if model else None
+
+        # A student listed twice keeps its last features
+        features_list = list({str(f.student_id): f for f in features_list}.values())
+        X = self.feature_matrix(features_list)
+        fingerprints = self.fingerprint(X)
+
+        # Locked until commit: history and counter deltas are computed from these rows
+        existing = profile_repository.get_profiles(db, [str(f.student_id) for f in features_list], for_update=True)
+        changed = np.array([
+            force or str(f.student_id) not in existing
+            or existing[str(f.student_id)].feature_fingerprint != fp
+            or existing[str(f.student_id)].model_version != model_version
+            for f, fp in zip(features_list, fingerprints)
+        ], dtype=bool)
+        skipped = [existing[str(f.student_id)] for f, is_changed in zip(features_list, changed) if not is_changed]
+        metrics.incr("profiles.skipped", len(skipped))
+        metrics.incr("profiles.recomputed", int(changed.sum()))
+        if not changed.any():
+            logger.info(f"Features unchanged for all {len(features_list)} students, nothing to recompute")
+            return [self._to_result(row) for row in skipped]
+
+        changed_features = [f for f, is_changed in zip(features_list, changed) if is_changed]
+        try:
+            cluster_ids = self.predict_clusters(X[changed], model)
+        except Exception as e:
+            logger.error(f"Error during prediction pipeline: {e}")
+            raise e
+        logger.info(f"Predicted clusters for {len(changed_features)} students ({len(skipped)} unchanged)")
+
+        saved = self.save_profiles(
+            db, [str(f.student_id) for f in changed_features], X[changed], cluster_ids,
+            [fp for fp, is_changed in zip(fingerprints, changed) if is_changed], existing, model_version
+        )
+        online_kmeans.observe(self, model, X[changed], cluster_ids)
+        # Back to request order: RETURNING rows come in no guaranteed order
+        rows = {row.student_id: row for row in saved + skipped}
+        return [self._to_result(rows[str(f.student_id)]) for f in features_list]
+
+    def save_profiles(self, db: Session, student_ids: List[str], X: np.ndarray, cluster_ids: np.ndarray,
+                      fingerprints: List[str], existing: dict, model_version: Optional[str]) -> list:
+        """
+        Persists already-scored profiles in one transaction: bulk upsert, history
+        rows and profile_updated outbox events. `existing` maps student_id to the
+        stored row before this write, read in the same transaction with
+        ProfileRepository.get_profiles(for_update=True), and model_version is
+        the version that produced cluster_ids.
+        """
+        mean_scores = X[:, FEATURE_NAMES.index("mean_score")].tolist()
+        progress_rates = X[:, FEATURE_NAMES.index("progress_rate")].tolist()
 
         # Profile names based on your demo and model's likely clusters
         # 0: At-Risk, 1: Regular, 2: Procrastinator
-        profil_type = self.cluster_profile_map.get(cluster_id, "Unknown")
-        # Cluster to Risk Map: 0: At-Risk (High), 1: Regular (Low), 2: Procrastinator (Medium)
-        risk_map = {0: "High", 1: "Low", 2: "Medium"}
-        risk_level = risk_map.get(cluster_id, "Low")
+        rows = []
+        for student_id, cluster_id, mean_score, progress_rate, fp in zip(
+                student_ids, np.asarray(cluster_ids).tolist(), mean_scores, progress_rates, fingerprints):
+            rows.append({
+                "student_id": student_id,
+                "cluster_id": cluster_id,
+                "profil_type": self.cluster_profile_map.get(cluster_id, "Unknown"),
+                "mean_score": mean_score,
+                "progress_rate": progress_rate,
+                "risk_level": RISK_MAP.get(cluster_id, "Low"),
+                "feature_fingerprint": fp,
+                "model_version": model_version,
+            })
 
         try:
-            student_profile = db.query(StudentProfile).filter(StudentProfile.student_id == str(features.student_id)).first()
-            
-            if student_profile:
-                logger.info(f"Updating existing profile for student {features.student_id}")
-                student_profile.cluster_id = cluster_id
-                student_profile.profil_type = profil_type
-                student_profile.mean_score = features.mean_score
-                student_profile.progress_rate = features.progress_rate
-                student_profile.risk_level = risk_level
-            else:
-                logger.info(f"Creating new profile for student {features.student_id}")
-                student_profile = StudentProfile(
-                    student_id=str(features.student_id),
-                    cluster_id=cluster_id,
-                    profil_type=profil_type,
-                    mean_score=features.mean_score,
-                    progress_rate=features.progress_rate,
-                    risk_level=risk_level
-                )
-                db.add(student_profile)
-            
+            while True:
+                # Students without a profile are inserted first. If a concurrent
+                # writer created one since `existing` was read, start over with
+                # it locked too, so its previous values are known (re-locking
+                # everything keeps the lock order, hence no deadlock)
+                new_rows = [row for row in rows if row["student_id"] not in existing]
+                saved = profile_repository.insert_new_profiles(db, new_rows)
+                if len(saved) == len(new_rows):
+                    break
+                metrics.incr("profiles.insert_races")
+                db.rollback()
+                existing = profile_repository.get_profiles(db, student_ids, for_update=True)
+            saved += profile_repository.upsert_profiles(db, [row for row in rows if row["student_id"] in existing])
+            profile_repository.add_history(db, saved, existing)
+            profile_repository.add_counter_deltas(db, saved, existing)
+            # profile_updated events commit atomically with the profiles;
+            # the outbox relay publishes them to RabbitMQ
+            profile_repository.add_outbox_events(db, [
+                ProfilePublisher.build_event(row.student_id, row.profil_type, row.risk_level, row.cluster_id)
+                for row in saved
+            ])
             db.commit()
-            db.refresh(student_profile)
-            
-            # Publish profile update event to RabbitMQ
-            try:
-                from app.services.publisher import profile_publisher
-                profile_publisher.publish_profile_update(
-                    student_id=features.student_id,
-                    profile_type=profil_type,
-                    risk_level=risk_level,
-                    cluster_id=cluster_id
-                )
-            except Exception as pub_error:
-                logger.warning(f"Failed to publish profile update event: {pub_error}")
-
-            return PredictionResult.from_orm(student_profile)
-
         except Exception as e:
             logger.error(f"Error saving to database: {e}")
             db.rollback()
             raise e
 
+        outbox_relay.notify()
+        profile_cache.put_many(profile_to_dict(row) for row in saved)
+        return saved
+
+    @staticmethod
+    def _to_result(row) -> PredictionResult:
+        return PredictionResult(
+            student_id=int(row.student_id),
+            cluster_id=row.cluster_id,
+            profil_type=row.profil_type,
+            timestamp=row.timestamp
+        )
+
 profiling_service = ProfilingService()
@@ -0,0 +1,142 @@
+"""
+Full-cohort re-profiling, e.g. after a new model has been deployed.
+
+Streams the latest feature row of every student from the LMS DB through a
+server-side cursor, scores chunks in a process pool and bulk-upserts each
+chunk in its own transaction. Students are visited in id order and the last
+committed id is checkpointed, so an interrupted run resumes where it stopped.
+
+Run from the student-profiler directory:
+    python -m app.services.reprofile [--restart] [--workers N] [--chunk-size N]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from app.core.database import SessionLocal
+from app.repositories.profile_repository import profile_repository
+from app.services.consumer import lms_engine
+from app.services.profiler import profiling_service, ProfilingService, FEATURE_NAMES
+
+logger = logging.getLogger(__name__)
+
+REPROFILE_CHUNK_SIZE = int(os.getenv('REPROFILE_CHUNK_SIZE', '5000'))
+REPROFILE_WORKERS = int(os.getenv('REPROFILE_WORKERS', str(os.cpu_count() or 1)))
+REPROFILE_CHECKPOINT = os.getenv('REPROFILE_CHECKPOINT', 'reprofile.checkpoint.json')
+
+# Same row selection as the consumer, for every student after the checkpoint
+ALL_LATEST_FEATURES_SQL = text(f"""
+    SELECT DISTINCT ON (id_student) id_student, {", ".join(FEATURE_NAMES)}
+    FROM student_features
+    WHERE id_student > :after
+    AND (mean_score IS NOT NULL OR progress_rate > 0)
+    ORDER BY id_student, synced_at DESC
+""")
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, state: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def stream_feature_chunks(after: int, chunk_size: int):
+    """Yields (student_ids, X) chunks from a server-side cursor, in id order."""
+    with lms_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+            ALL_LATEST_FEATURES_SQL, {"after": after}
+        )
+        for rows in result.partitions(chunk_size):
+            student_ids = [row[0] for row in rows]
+            # Missing LMS values count as 0, as in the consumer
+            X = np.array([row[1:] for row in rows], dtype=np.float64)
+            yield student_ids, np.nan_to_num(X, nan=0.0)
+
+def score_chunk(X: np.ndarray) -> Tuple[np.ndarray, List[str], Optional[str]]:
+    """Runs in a pool worker; the model comes from the parent when forked."""
+    model = profiling_service.model
+    return profiling_service.predict_clusters(X, model), ProfilingService.fingerprint(X), model.version if model else None
+
+def run_reprofile(restart: bool = False, workers: int = REPROFILE_WORKERS,
+                  chunk_size: int = REPROFILE_CHUNK_SIZE, checkpoint: str = REPROFILE_CHECKPOINT) -> dict:
+    # Fork after the model is loaded so workers share it instead of reloading
+    model_version = profiling_service.load_model().version
+    state = None if restart else load_checkpoint(checkpoint)
+    if state and state.get("model_version") != model_version:
+        logger.info(f"Checkpoint was written for model {state.get('model_version')}, starting over with {model_version}")
+        state = None
+    if state:
+        logger.info(f"Resuming re-profiling after student {state['last_student_id']} ({state['rows']} rows done)")
+    state = state or {"last_student_id": -1, "rows": 0, "model_version": model_version}
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context) if workers > 0 else None
+
+    start = time.monotonic()
+    rows_this_run = 0
+    # Chunks being scored; bounded so the cursor never runs far ahead of the writes
+    in_flight = deque()
+
+    def commit_oldest():
+        nonlocal rows_this_run
+        student_ids, X, scored = in_flight.popleft()
+        cluster_ids, fingerprints, model_version = scored.result() if pool else scored
+        ids = [str(student_id) for student_id in student_ids]
+        with SessionLocal() as db:
+            existing = profile_repository.get_profiles(db, ids, for_update=True)
+            profiling_service.save_profiles(db, ids, X, cluster_ids, fingerprints, existing, model_version)
+
+        rows_this_run += len(ids)
+        state["last_student_id"] = student_ids[-1]
+        state["rows"] += len(ids)
+        save_checkpoint(checkpoint, state)
+        elapsed = time.monotonic() - start
+        logger.info(f"Re-profiled {state['rows']} students ({rows_this_run / elapsed:,.0f} rows/s)")
+
+    try:
+        for student_ids, X in stream_feature_chunks(state["last_student_id"], chunk_size):
+            scored = pool.submit(score_chunk, X) if pool else score_chunk(X)
+            in_flight.append((student_ids, X, scored))
+            if len(in_flight) > max(workers, 1) * 2:
+                commit_oldest()
+        while in_flight:
+            commit_oldest()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.monotonic() - start
+    summary = {
+        "rows": rows_this_run,
+        "total_rows": state["rows"],
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows_this_run / elapsed, 1) if elapsed else 0.0,
+    }
+    logger.info(f"Re-profiling finished: {summary}")
+    # A completed run starts from scratch next time
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return summary
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Re-profile every student with the current model.")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--workers", type=int, default=REPROFILE_WORKERS, help="scoring processes (0 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=REPROFILE_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=REPROFILE_CHECKPOINT)
+    args = parser.parse_args()
+    print(json.dumps(run_reprofile(args.restart, args.workers, args.chunk_size, args.checkpoint)))
@@ -0,0 +1,72 @@
+"""
+Parity check and microbenchmark: compiled NumPy pipeline vs the sklearn path.
+
+Run from the student-profiler directory:
+    python benchmarks/bench_pipeline.py [n_students]
+"""
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+from app.services.profiler import profiling_service  # noqa: E402
+
+
+def synthetic_features(n, seed=0):
+    """Random feature rows with the value ranges seen in the LMS, ~1% missing."""
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 3000, n),      # total_clicks
+        rng.integers(0, 20, n),        # assessment_submissions_count
+        rng.random(n) * 100,           # mean_score
+        rng.integers(0, 200, n),       # active_days
+        rng.random(n) * 500,           # study_duration
+        rng.random(n),                 # progress_rate
+    ]).astype(np.float64)
+    X[rng.random(X.shape) < 0.01] = np.nan
+    return X
+
+
+def per_call_us(fn, X, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    profiling_service.load_model()
+    if profiling_service.compiled is None:
+        sys.exit("No compiled pipeline: model file missing or not a dict pipeline.")
+
+    X = synthetic_features(n)
+
+    # Parity
+    expected = profiling_service.predict_clusters_sklearn(X)
+    actual = profiling_service.predict_clusters(X)
+    mismatches = int((expected != actual).sum())
+    print(f"Parity: {n - mismatches}/{n} identical cluster ids")
+    if mismatches:
+        sys.exit(f"FAILED: {mismatches} mismatches between compiled and sklearn paths")
+
+    # Single student latency
+    row = X[:1]
+    sklearn_us = per_call_us(profiling_service.predict_clusters_sklearn, row, 200)
+    compiled_us = per_call_us(profiling_service.predict_clusters, row, 2000)
+    print(f"Single student: sklearn {sklearn_us:.1f} µs | compiled {compiled_us:.1f} µs ({sklearn_us / compiled_us:.0f}x)")
+
+    # Batch throughput
+    for name, fn in (("sklearn", profiling_service.predict_clusters_sklearn), ("compiled", profiling_service.predict_clusters)):
+        start = time.perf_counter()
+        fn(X)
+        elapsed = time.perf_counter() - start
+        print(f"Batch of {n} ({name}): {n / elapsed:,.0f} students/s")
+
+
+if __name__ == "__main__":
+    main()
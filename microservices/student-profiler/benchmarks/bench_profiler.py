@@ -0,0 +1,307 @@
+"""
+End-to-end benchmark suite for student-profiler.
+
+Runs the real endpoints (in-process, through FastAPI's TestClient), the
+batching consumer fed by an in-memory broker stand-in, and profile reads,
+against SQLite (default) or Postgres. On Postgres everything runs in a
+throwaway schema that is dropped afterwards; any other --database-url must
+have empty profiler tables, since they are recreated. The model is a
+synthetic pipeline with the same shape as student_profiler_model.joblib, so
+results do not depend on the checked-in model file.
+
+Prints one JSON document (p50/p99 latency, throughput, peak RSS per
+scenario) so results can be diffed between releases.
+
+Run from the student-profiler directory:
+    python benchmarks/bench_profiler.py [--database-url URL] [--students N] [--output FILE]
+                                        [--i-know-this-drops-tables]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import warnings
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+MODEL_VERSION = "bench-synthetic"
+FEATURE_COLS = ["total_clicks", "active_days", "study_duration", "progress_rate"]
+
+
+def build_synthetic_model(model_dir, seed=0):
+    """imputer -> scaler -> PCA(3) -> KMeans(3) on random data, like the shipped model."""
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "total_clicks": rng.integers(0, 3000, 5000),
+        "active_days": rng.integers(0, 200, 5000),
+        "study_duration": rng.random(5000) * 500,
+        "progress_rate": rng.random(5000),
+    }).astype(float)
+    imputer = SimpleImputer(strategy="median").fit(df)
+    scaler = StandardScaler().fit(pd.DataFrame(imputer.transform(df), columns=FEATURE_COLS))
+    scaled = scaler.transform(pd.DataFrame(imputer.transform(df), columns=FEATURE_COLS))
+    pca = PCA(n_components=3, random_state=seed).fit(scaled)
+    kmeans = KMeans(n_clusters=3, n_init=3, random_state=seed).fit(pca.transform(scaled))
+    joblib.dump({
+        "imputer": imputer, "scaler": scaler, "pca": pca, "kmeans": kmeans,
+        "feature_cols": FEATURE_COLS, "profile_mapping": {},
+    }, os.path.join(model_dir, f"{MODEL_VERSION}.joblib"))
+
+
+def synthetic_student(student_id, rng):
+    return {
+        "student_id": student_id,
+        "total_clicks": int(rng.integers(0, 3000)),
+        "assessment_submissions_count": int(rng.integers(0, 20)),
+        "mean_score": float(rng.random() * 100),
+        "active_days": int(rng.integers(0, 200)),
+        "study_duration": float(rng.random() * 500),
+        "progress_rate": float(rng.random()),
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def summarize(latencies, items, elapsed):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "throughput_per_s": round(items / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed_calls(fn, args_list, items_per_call=1):
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, items_per_call * len(args_list), time.perf_counter() - start)
+
+
+def ok(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text}")
+    return response
+
+
+class InMemoryChannel:
+    """
+    Stand-in for a pika BlockingChannel: consume() yields the queued messages,
+    then one inactivity tick (None, None, None) so the last batch is flushed.
+    """
+
+    class Method:
+        def __init__(self, delivery_tag):
+            self.delivery_tag = delivery_tag
+            self.redelivered = False
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.acked = 0
+
+    def consume(self, queue, inactivity_timeout=None):
+        for tag, body in enumerate(self.bodies, start=1):
+            yield self.Method(tag), None, body
+        yield None, None, None
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acked = delivery_tag
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        raise RuntimeError("batch failed")
+
+
+def open_bench_engine(database_url, allow_drop):
+    """
+    Engine whose profiler tables can be recreated. Returns (engine, cleanup).
+
+    Postgres gets a fresh schema (first on search_path) that cleanup drops.
+    Elsewhere the tables are dropped in place, so the run is refused if they
+    hold rows, unless allow_drop is set.
+    """
+    from sqlalchemy import create_engine, inspect, select, func
+    from app.core.database import Base
+
+    engine = create_engine(database_url)
+    if engine.dialect.name == "postgresql":
+        schema = f"profiler_bench_{os.getpid()}_{int(time.time())}"
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'CREATE SCHEMA "{schema}"')
+        engine.dispose()
+        bench_engine = create_engine(database_url, connect_args={"options": f"-csearch_path={schema}"})
+
+        def cleanup():
+            bench_engine.dispose()
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f'DROP SCHEMA "{schema}" CASCADE')
+            engine.dispose()
+        Base.metadata.create_all(bench_engine)
+        return bench_engine, cleanup
+
+    existing = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        populated = [
+            table.name for table in Base.metadata.sorted_tables
+            if table.name in existing and conn.execute(select(func.count()).select_from(table)).scalar()
+        ]
+    if populated and not allow_drop:
+        engine.dispose()
+        raise SystemExit(
+            f"Refusing to benchmark against {engine.url!r}: {', '.join(populated)} contain rows and would be "
+            "dropped. Use a Postgres URL (throwaway schema), an empty database, or pass --i-know-this-drops-tables."
+        )
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine, engine.dispose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="student-profiler benchmark suite")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file; Postgres runs in a throwaway schema")
+    parser.add_argument("--i-know-this-drops-tables", dest="allow_drop", action="store_true",
+                        help="allow dropping non-empty profiler tables on a non-Postgres --database-url")
+    parser.add_argument("--students", type=int, default=2000, help="single predictions and profile reads")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=20000, help="consumer messages")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="profiler-bench-")
+    build_synthetic_model(workdir)
+    # Settings are read at import time
+    os.environ["MODEL_DIR"] = workdir
+    os.environ.setdefault("INFERENCE_MAX_QUEUE", "100000")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported once the settings above are in place
+    import app.models.domain  # noqa: F401  (registers the tables)
+
+    engine, cleanup = open_bench_engine(database_url, args.allow_drop)
+    try:
+        run_scenarios(engine, args)
+    finally:
+        cleanup()
+
+
+def run_scenarios(engine, args):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import sessionmaker
+    from app.api.endpoints import router
+    from app.core.database import get_db, ensure_monthly_partitions, MONTHLY_PARTITIONED_TABLES
+    from app.services import consumer
+    from app.services.profile_cache import profile_cache
+    from app.services.profiler import profiling_service
+    from app.schemas.pydantic_models import StudentFeatures
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for table in MONTHLY_PARTITIONED_TABLES:
+                ensure_monthly_partitions(conn, table)
+    Session = sessionmaker(bind=engine)
+    profiling_service.load_model()
+
+    app = FastAPI()
+    app.include_router(router)
+
+    def get_bench_db():
+        with Session() as db:
+            yield db
+    app.dependency_overrides[get_db] = get_bench_db
+    client = TestClient(app)
+    rng = np.random.default_rng(1)
+    report = {
+        "database": engine.dialect.name,
+        "model_version": profiling_service.model_version,
+        "python": platform.python_version(),
+        "scenarios": {},
+    }
+    scenarios = report["scenarios"]
+
+    # 1. Single predictions through POST /predict_clusters
+    singles = [(synthetic_student(i, rng),) for i in range(args.students)]
+    scenarios["predict_single"] = timed_calls(lambda body: ok(client.post("/predict_clusters", json=body)), singles)
+
+    # 2. Batch predictions through POST /predict_clusters/batch (all students changed)
+    batches = [
+        ({"students": [synthetic_student(args.students + b * args.batch_size + i, rng) for i in range(args.batch_size)]},)
+        for b in range(args.batches)
+    ]
+    scenarios["predict_batch"] = timed_calls(
+        lambda body: ok(client.post("/predict_clusters/batch", json=body)), batches, args.batch_size
+    )
+    scenarios["predict_batch"]["batch_size"] = args.batch_size
+
+    # 3. Consumer: message parsing, batching, prediction and bulk upsert; the
+    # LMS feature lookup is replaced by an in-memory table
+    lms = {
+        i: StudentFeatures(**synthetic_student(i, rng))
+        for i in range(args.messages)
+    }
+    consumer.fetch_latest_features = lambda ids: [lms[i] for i in ids if i in lms]
+    consumer.SessionLocal = Session
+    batch_latencies = []
+    process_batch = consumer.process_batch
+
+    def timed_process_batch(bodies):
+        t0 = time.perf_counter()
+        process_batch(bodies)
+        batch_latencies.append(time.perf_counter() - t0)
+    consumer.process_batch = timed_process_batch
+
+    channel = InMemoryChannel([json.dumps({"studentId": i}).encode() for i in range(args.messages)])
+    start = time.perf_counter()
+    consumer.consume_batches(channel)
+    elapsed = time.perf_counter() - start
+    consumer.process_batch = process_batch
+    if channel.acked != args.messages:
+        raise RuntimeError(f"Consumer acked {channel.acked} of {args.messages} messages")
+    scenarios["consumer"] = summarize(batch_latencies, args.messages, elapsed)
+    scenarios["consumer"]["batch_size"] = consumer.BATCH_SIZE
+
+    # 4. Profile reads: cold (cache misses), warm (cache hits), multi-get
+    ids = [(str(i),) for i in range(args.students)]
+    profile_cache.clear()
+    scenarios["read_profile_cold"] = timed_calls(lambda sid: ok(client.get(f"/profile/{sid}")), ids)
+    scenarios["read_profile_warm"] = timed_calls(lambda sid: ok(client.get(f"/profile/{sid}")), ids)
+    profile_cache.clear()
+    groups = [([str(i) for i in range(start, start + 100)],) for start in range(0, args.students, 100)]
+    scenarios["read_profiles_batch_get"] = timed_calls(
+        lambda group: ok(client.post("/profiles:batchGet", json={"student_ids": group})), groups, 100
+    )
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for serving with several uvicorn workers.
+
+The app and the model are loaded once in the master (preload_app) and the
+workers are forked from it, so they start instantly and share the model's
+memory pages copy-on-write instead of each unpickling their own copy.
+Threads, database connections and the broker connection are created per
+worker at startup, after the fork.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('INSTANCE_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+def on_starting(server):
+    from app.services.profiler import profiling_service
+    try:
+        profiling_service.load_model()
+    except Exception as e:
+        # Workers keep retrying during warm-up and report not ready meanwhile
+        server.log.error(f"Could not preload model: {e}")
+    # Keep the preloaded objects out of the collector so it does not touch
+    # (and un-share) their pages in every worker
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Never reuse pooled connections opened in the master
+    from app.core.database import engine
+    engine.dispose(close=False)